@@ -23,3 +23,8 @@ class DataError(Error):
     pass
 
 
+class TimeoutError(Error):
+    """Raised if gnuplot does not respond in time"""
+    pass
+
+
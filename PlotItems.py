@@ -14,16 +14,21 @@ behavior.
 
 """
 
-import os, string, tempfile, types
+import os, string, tempfile, types, mmap, weakref
 
 try:
     from cStringIO import StringIO
 except ImportError:
     from StringIO import StringIO
 
+try:
+    import threading
+except ImportError:
+    import dummy_threading as threading
+
 import numpy
 
-import gp, utils, Errors
+import gp, utils, decimation, termdefs, Errors
 
 
 class _unset:
@@ -193,6 +198,34 @@ class PlotItem:
             self.get_command_option_string(),
             ])
 
+    def define(self, f):
+        """Send gnuplot anything that must be defined before plotting.
+
+        This method is called for each item before the plot command is
+        issued, with the low-level gnuplot process 'f' (which can be
+        called with a command string or written to).  It can be
+        overridden in derived classes; see 'Datablock'.
+
+        """
+
+        pass
+
+    def set_resolution(self, width, xrange):
+        """Tell the item how finely it will be drawn.
+
+        This method is called for each item before the plot command is
+        built.  'width' is the width of the plot in pixels, or None if
+        it is unknown or if every data point should be plotted (e.g.,
+        for vector output); 'xrange' is the plot's xrange as a tuple
+        '(xmin, xmax)' (either of which may be None for autoscaling),
+        or None if it is unknown.  Items can override this to avoid
+        sending more data than can be seen; see 'Data(...,
+        decimate="auto")'.
+
+        """
+
+        pass
+
     def pipein(self, f):
         """Pipe necessary inline data to gnuplot.
 
@@ -283,6 +316,10 @@ class _FileItem(PlotItem):
             'binary=<boolean>' -- data in the file is in binary format
                 (this option is only allowed for grid data for splot).
 
+            'binary=<string>' -- data in the file is in gnuplot's
+                general binary format, described by the keywords in
+                <string> (e.g., 'record=100 format="%float64"').
+
             'smooth=<string>' -- smooth the data.  Option should be
                 'unique', 'csplines', 'acsplines', 'bezier', or
                 'sbezier'.
@@ -290,6 +327,13 @@ class _FileItem(PlotItem):
         The keyword arguments recognized by 'PlotItem' can also be
         used here.
 
+        If the 'missing' member is set to a string, gnuplot is told
+        (via 'set datafile missing') that this string marks a missing
+        value before the item is plotted.  Since that setting applies
+        to the whole plot, items plotted together should agree on it;
+        the next plot in which no item sets 'missing' unsets it again
+        (a marker set by a command of the user's own is left alone).
+
         Note that the 'using' option is interpreted by gnuplot, so
         columns must be numbered starting with 1.
 
@@ -326,7 +370,13 @@ class _FileItem(PlotItem):
             raise Errors.OptionError('%s=%s' % (name, value,))
 
     def set_option_binary(self, binary):
-        if binary:
+        if binary and type(binary) is types.StringType:
+            if not gp.GnuplotOpts.recognizes_general_binary:
+                raise Errors.OptionError(
+                    'Gnuplot.py is currently configured to reject '
+                    'general binary data')
+            self._options['binary'] = (binary, 'binary %s' % (binary,))
+        elif binary:
             if not gp.GnuplotOpts.recognizes_binary_splot:
                 raise Errors.OptionError(
                     'Gnuplot.py is currently configured to reject binary data')
@@ -334,35 +384,378 @@ class _FileItem(PlotItem):
         else:
             self._options['binary'] = (0, None)
 
+    # The string written in place of missing values, if any:
+    missing = None
+
+    def set_resolution(self, width, xrange):
+        content = getattr(self, 'content', None)
+        if hasattr(content, 'set_resolution'):
+            self._set_content_resolution(content, width, xrange)
+
+    def _set_content_resolution(self, content, width, xrange):
+        """Pass the resolution on to 'content'; return true if it changed."""
+
+        if not content.set_resolution(width, xrange):
+            return 0
+        spec = content.get_binary_spec()
+        if spec is not None:
+            # The shape of the data has changed:
+            self.set_option_binary(spec)
+        return 1
+
+
+def _write_content(f, content):
+    """Write the content of a _FileItem to the file-like object 'f'.
+
+    'content' is either a string or a callable object that writes the
+    data itself when called with 'f' as its only argument.  The latter
+    allows data to be written to gnuplot without ever holding all of
+    it in memory at once (see 'StreamData').
+
+    """
+
+    if type(content) is types.StringType:
+        f.write(content)
+    else:
+        content(f)
+
+
+def _check_content(content):
+    """Raise an error now if 'content' could not be written.
+
+    Inline and FIFO data are only written after the plot command has
+    been sent, when an error would leave gnuplot waiting for data, so
+    content that can fail (see '_ChunkWriter') has a 'check()' method
+    that is called while the command is being built.
+
+    """
+
+    if hasattr(content, 'check'):
+        content.check()
+
+
+def _get_precision(keyw):
+    """Remove the 'precision' option from 'keyw' and return its value.
+
+    The default is 'gp.GnuplotOpts.text_precision'.  See
+    'utils.value_format()'.
+
+    """
+
+    precision = keyw.get('precision', gp.GnuplotOpts.text_precision)
+    if 'precision' in keyw:
+        del keyw['precision']
+    if precision is not None \
+       and (type(precision) is not types.IntType or precision < 1):
+        raise Errors.OptionError('precision=%s' % (precision,))
+    return precision
+
+
+def _write_text(f, data, precision=None):
+    """Write an array to 'f' as text with 'precision' digits."""
+
+    utils.write_array(f, data, precision=precision)
+
+
+class _Content:
+    """The content of a _FileItem, written by calling a function.
+
+    Calling the object writes the content to a file by calling
+    'producer(f, *args)'.  This is used to postpone the work of
+    converting data into the form that gnuplot reads until the data
+    are actually needed.
+
+    """
+
+    def __init__(self, producer, *args):
+        self.producer = producer
+        self.args = args
+
+    def __call__(self, f):
+        self.producer(f, *self.args)
+
+
+class _CachedContent(_Content):
+    """A _Content that is produced once, then kept as a string.
+
+    The first time the content is needed, the producer is run and its
+    output is saved; afterwards the producer and its arguments are
+    released (so, for example, an array that has been formatted as
+    text can be freed) and the saved string is written instead.
+
+    """
+
+    def __init__(self, producer, *args):
+        _Content.__init__(self, producer, *args)
+        self.value = None
+        # The content may be needed simultaneously by several
+        # _FIFOWriter threads:
+        self.lock = threading.Lock()
+
+    def __call__(self, f):
+        self.lock.acquire()
+        try:
+            if self.value is None:
+                s = StringIO()
+                self.producer(s, *self.args)
+                self.value = s.getvalue()
+                self.producer = self.args = None
+        finally:
+            self.lock.release()
+        f.write(self.value)
+
+
+class _DecimatedContent:
+    """Data points decimated to suit the resolution of the plot.
+
+    This is the content of a 'Data(..., decimate="auto")' item.  Its
+    'set_resolution()' method is called (via the item) before each
+    plot with the width of the plot in pixels and the xrange; the
+    points within the xrange (plus one on either side, so that lines
+    run to the edge of the plot) are then reduced to about twice the
+    width using 'decimation.decimate()'.  If the width is None, all of
+    the points are kept.
+
+    Members:
+
+        'data' -- the full 2-d array of data points, with x values in
+            the first column.
+
+        'method' -- the name of the decimation method.
+
+        'binary' -- true if the data are written in binary.
+
+        'precision' -- the precision of text data (see
+            'utils.value_format()').
+
+        'value' -- the data points selected for the current
+            resolution.
+
+    """
+
+    def __init__(self, data, method, binary, precision=None):
+        if data.shape[1] == 1:
+            # Plot the values against their index, as gnuplot would:
+            index = numpy.arange(len(data)).astype(data.dtype)
+            data = numpy.concatenate((index[:,numpy.newaxis], data), 1)
+        self.data = data
+        self.method = method
+        self.binary = binary
+        self.precision = precision
+        self.resolution = None
+        self.set_resolution(
+            termdefs.get_resolution(gp.GnuplotOpts.default_term), None)
+
+    def set_resolution(self, width, xrange):
+        """Select the points to plot; return true if they changed."""
+
+        if (width, xrange) == self.resolution:
+            return 0
+        self.resolution = (width, xrange)
+
+        data = self.data
+        if xrange is not None:
+            x = data[:,0]
+            (start, stop) = (0, len(data))
+            if xrange[0] is not None:
+                start = max(numpy.searchsorted(x, xrange[0], 'left') - 1, 0)
+            if xrange[1] is not None:
+                stop = numpy.searchsorted(x, xrange[1], 'right') + 1
+            data = data[start:stop]
+        if width is not None:
+            data = decimation.decimate(data, 2 * width, self.method)
+        self.value = numpy.ascontiguousarray(data)
+        return 1
+
+    def get_binary_spec(self):
+        """Return the general binary keywords for the data, or None."""
+
+        if self.binary:
+            return _binary_record_spec(self.value.shape, self.value.dtype)
+        else:
+            return None
+
+    def snapshot(self):
+        """Return content that writes the points selected just now.
+
+        The selection changes with the next 'set_resolution()', but
+        the returned content does not, so it can be written later
+        (e.g., by a '_FIFOWriter') while the item is plotted again.
+
+        """
+
+        if self.binary:
+            return _Content(utils.write_binary, self.value)
+        else:
+            return _Content(_write_text, self.value, self.precision)
+
+    def __call__(self, f):
+        self.snapshot()(f)
+
+
+class _MipmapContent:
+    """Grid data reduced to suit the resolution of the plot.
+
+    This is the content of a uniform binary 'GridData' or an 'Image'
+    created with the 'mipmap' option.  Before each plot, the level of
+    a 'decimation.Pyramid' is chosen that has at least as many cells
+    across the visible part of the xrange as the plot has pixels, and
+    only the visible cells of that level (plus one on either side) are
+    sent.  The levels are cached, so zooming in and out reuses them.
+
+    Members:
+
+        'pyramid' -- the 'decimation.Pyramid' of the data.
+
+        'xaxis' -- the index of 'data' that selects the x coordinate
+            (0 for 'GridData', 1 for 'Image'); the other of the first
+            two indices selects the y coordinate.
+
+        'xgrid', 'ygrid' -- '(origin, delta)' of the full-resolution
+            grid in x and y.
+
+        'values' -- the number of values per cell.
+
+        'options' -- extra general binary keywords (e.g., 'flipy').
+
+        'value' -- the data to be sent at the current resolution.
+
+    """
+
+    def __init__(self, data, method, xaxis, xgrid, ygrid, values=1,
+                 options=''):
+        self.pyramid = decimation.Pyramid(data, method)
+        self.xaxis = xaxis
+        self.xgrid = xgrid
+        self.ygrid = ygrid
+        self.values = values
+        self.options = options
+        self.selection = None
+        self.set_resolution(
+            termdefs.get_resolution(gp.GnuplotOpts.default_term), None)
+
+    def set_resolution(self, width, xrange):
+        """Select the cells to send; return true if they changed."""
+
+        (x0, dx) = self.xgrid
+        (start, stop) = (0, self.pyramid.level(0).shape[self.xaxis])
+        if xrange is not None and dx > 0:
+            if xrange[0] is not None:
+                start = max(int(numpy.floor((xrange[0] - x0) / dx)), start)
+            if xrange[1] is not None:
+                stop = min(int(numpy.ceil((xrange[1] - x0) / dx)) + 1, stop)
+            if start >= stop:
+                (start, stop) = (0, self.pyramid.level(0).shape[self.xaxis])
+
+        level = 0
+        if width is not None:
+            while (stop - start) >> (level + 1) >= width:
+                level = level + 1
+        # The visible cells at that level, plus one on either side:
+        data = self.pyramid.level(level)
+        start = max((start >> level) - 1, 0)
+        stop = min(((stop - 1) >> level) + 2, data.shape[self.xaxis])
+
+        if (level, start, stop) == self.selection:
+            return 0
+        self.selection = (level, start, stop)
+
+        if self.xaxis == 0:
+            data = data[start:stop]
+        else:
+            data = data[:,start:stop]
+        self.value = numpy.ascontiguousarray(data)
+        return 1
+
+    def get_binary_spec(self):
+        """Return the general binary keywords for the data."""
+
+        (level, start, stop) = self.selection
+        scale = 2 ** level
+        (x0, dx) = self.xgrid
+        (y0, dy) = self.ygrid
+        # The centre of a block of 'scale' cells:
+        xgrid = (x0 + (start * scale + 0.5 * (scale - 1)) * dx, scale * dx)
+        ygrid = (y0 + 0.5 * (scale - 1) * dy, scale * dy)
+        if self.xaxis == 0:
+            (numx, numy) = self.value.shape[:2]
+        else:
+            (numy, numx) = self.value.shape[:2]
+        return _binary_array_spec(
+            numx, numy, self.xaxis == 0, xgrid, ygrid, self.value.dtype,
+            self.values) + self.options
+
+    def snapshot(self):
+        """Return content that writes the cells selected just now."""
+
+        return _Content(utils.write_binary, self.value)
+
+    def __call__(self, f):
+        self.snapshot()(f)
+
+
+def _temp_file(binary=0):
+    """Create a new, empty temporary file and return its name."""
+
+    if hasattr(tempfile, 'mkstemp'):
+        # Use the new secure method of creating temporary files:
+        (fd, filename,) = tempfile.mkstemp(
+            suffix='.gnuplot', text=(not binary)
+            )
+        os.close(fd)
+    else:
+        # for backwards compatibility to pre-2.3:
+        filename = tempfile.mktemp()
+        open(filename, 'w').close()
+    return filename
+
 
 class _NewFileItem(_FileItem):
+    """A _FileItem whose data are written to a new file.
+
+    If a filename is specified, the content is written to that
+    (permanent) file immediately.  Otherwise a temporary file is
+    created, but the content is only written to it the first time the
+    item is plotted, so that an item that is never plotted costs
+    nothing to create.  The temporary file is deleted when the item is
+    deleted.  Content that depends on the resolution of the plot (see
+    '_DecimatedContent') is rewritten to a permanent file whenever the
+    resolution changes; a temporary file is never rewritten, since
+    gnuplot might still be reading it, but each resolution gets a
+    temporary file of its own, which is reused when the plot returns
+    to that resolution.
+
+    Members:
+
+        'files' -- for temporary files, a dictionary mapping each
+            '(width, xrange)' for which the content was written to
+            the name of its file (the initial file is under None).
+
+    """
+
     def __init__(self, content, filename=None, **keyw):
 
         binary = keyw.get('binary', 0)
         if binary:
-            mode = 'wb'
+            self.mode = 'wb'
         else:
-            mode = 'w'
+            self.mode = 'w'
+
+        if hasattr(content, 'set_resolution'):
+            self.source = content
+        else:
+            self.source = None
 
         if filename:
             # This is a permanent file
             self.temp = False
-            f = open(filename, mode)
+            self.content = content
+            self.write_content(filename)
         else:
             self.temp = True
-            if hasattr(tempfile, 'mkstemp'):
-                # Use the new secure method of creating temporary files:
-                (fd, filename,) = tempfile.mkstemp(
-                    suffix='.gnuplot', text=(not binary)
-                    )
-                f = os.fdopen(fd, mode)
-            else:
-                # for backwards compatibility to pre-2.3:
-                filename = tempfile.mktemp()
-                f = open(filename, mode)
-
-        f.write(content)
-        f.close()
+            filename = _temp_file(binary)
+            self.files = {None : filename}
+            self.content = content
 
         # If the user hasn't specified a title, set it to None so
         # that the name of the temporary file is not used:
@@ -371,9 +764,41 @@ class _NewFileItem(_FileItem):
 
         _FileItem.__init__(self, filename, **keyw)
 
+    def write_content(self, filename):
+        """Write the content to the file if it hasn't been written yet."""
+
+        if self.content is not None:
+            f = open(filename, self.mode)
+            try:
+                _write_content(f, self.content)
+            finally:
+                f.close()
+            self.content = None
+
+    def set_resolution(self, width, xrange):
+        if self.source is None \
+           or not self._set_content_resolution(self.source, width, xrange):
+            return
+        if not self.temp:
+            self.content = self.source.snapshot()
+        elif (width, xrange) in self.files:
+            self.filename = self.files[(width, xrange)]
+            self.content = None
+        else:
+            # (Written right away, since the plot command follows.)
+            self.filename = _temp_file(self.mode == 'wb')
+            self.files[(width, xrange)] = self.filename
+            self.content = self.source.snapshot()
+            self.write_content(self.filename)
+
+    def get_base_command_string(self):
+        self.write_content(self.filename)
+        return _FileItem.get_base_command_string(self)
+
     def __del__(self):
         if self.temp:
-            os.unlink(self.filename)
+            for filename in self.files.values():
+                os.unlink(filename)
 
 
 class _InlineFileItem(_FileItem):
@@ -392,13 +817,18 @@ class _InlineFileItem(_FileItem):
 
         _FileItem.__init__(self, '-', **keyw)
 
-        if content[-1] == '\n':
+        if type(content) is not types.StringType or content[-1] == '\n':
             self.content = content
         else:
             self.content = content + '\n'
 
+    def get_base_command_string(self):
+        _check_content(self.content)
+        return _FileItem.get_base_command_string(self)
+
     def pipein(self, f):
-        f.write(self.content + 'e\n')
+        _write_content(f, self.content)
+        f.write('e\n')
 
 
 if gp.GnuplotOpts.support_fifo:
@@ -443,12 +873,16 @@ if gp.GnuplotOpts.support_fifo:
             self.start()
 
         def run(self):
-            f = open(self.filename, self.mode)
-            f.write(self.content)
-            f.close()
-            os.unlink(self.filename)
-            if self.dirname is not None:
-                os.rmdir(self.dirname)
+            try:
+                f = open(self.filename, self.mode)
+                try:
+                    _write_content(f, self.content)
+                finally:
+                    f.close()
+            finally:
+                os.unlink(self.filename)
+                if self.dirname is not None:
+                    os.rmdir(self.dirname)
 
 
     class _FIFOFileItem(_FileItem):
@@ -482,10 +916,90 @@ if gp.GnuplotOpts.support_fifo:
 
             # Create a new FIFO and a thread to write to it.  Retrieve the
             # filename of the FIFO to be used in the basecommand.
-            fifo = _FIFOWriter(self.content, self.mode)
+            # Content that depends on the resolution is fixed now, since
+            # the item might be plotted again before the thread writes:
+            content = self.content
+            _check_content(content)
+            if hasattr(content, 'snapshot'):
+                content = content.snapshot()
+            fifo = _FIFOWriter(content, self.mode)
             return gp.double_quote_string(fifo.filename)
 
 
+def _get_cols(keyw):
+    """Remove the 'cols' option from 'keyw' and return it as a tuple.
+
+    A single column number is turned into a tuple; the default is
+    None, meaning all columns.
+
+    """
+
+    cols = keyw.get('cols')
+    if 'cols' in keyw:
+        del keyw['cols']
+    if isinstance(cols, types.IntType):
+        cols = (cols,)
+    return cols
+
+
+def _output_options(inline=_unset, filename=None, binary=0):
+    """Check how the data of an item are to be sent to gnuplot.
+
+    'inline' and 'filename' are the options of that name passed to a
+    data item ('inline' is '_unset' if it was not given) and 'binary'
+    tells whether the data are binary.  Return '(inline, filename)'
+    with the default applied: data go inline if
+    'gp.GnuplotOpts.prefer_inline_data' is set, unless they are binary
+    or saved to a file.
+
+    """
+
+    filename = filename or None
+    if inline is _unset:
+        inline = (
+            (not filename) and (not binary)
+            and gp.GnuplotOpts.prefer_inline_data
+            )
+    elif inline and filename:
+        raise Errors.OptionError(
+            'cannot pass data both inline and via a file'
+            )
+    elif inline and binary:
+        raise Errors.OptionError('binary inline data not supported')
+    return (inline, filename)
+
+
+def _get_output_options(keyw, binary=0):
+    """Remove 'inline' and 'filename' from 'keyw'; see '_output_options'."""
+
+    inline = keyw.get('inline', _unset)
+    filename = keyw.get('filename')
+    for opt in ['inline', 'filename']:
+        if opt in keyw:
+            del keyw[opt]
+    return _output_options(inline, filename, binary)
+
+
+def _make_file_item(content, keyw, inline=0, filename=None):
+    """Return the _FileItem that sends 'content' to gnuplot.
+
+    The content is sent inline if 'inline' is true, written to
+    'filename' if that is given, and otherwise passed through a FIFO
+    or a temporary file according to 'gp.GnuplotOpts.prefer_fifo_data'
+    (see '_output_options').  'keyw' are the options of the item.
+
+    """
+
+    if inline:
+        return _InlineFileItem(content, **keyw)
+    elif filename:
+        return _NewFileItem(content, filename=filename, **keyw)
+    elif gp.GnuplotOpts.prefer_fifo_data:
+        return _FIFOFileItem(content, **keyw)
+    else:
+        return _NewFileItem(content, **keyw)
+
+
 def File(filename, **keyw):
     """Construct a _FileItem object referring to an existing file.
 
@@ -505,139 +1019,1628 @@ def File(filename, **keyw):
     return _FileItem(filename, **keyw)
 
 
-def Data(*data, **keyw):
-    """Create and return a _FileItem representing the data from *data.
-
-    Create a '_FileItem' object (which is a type of 'PlotItem') out of
-    one or more Float Python numpy arrays (or objects that can be
-    converted to a float numpy array).  If the routine is passed a
-    single with multiple dimensions, then the last index ranges over
-    the values comprising a single data point (e.g., [<x>, <y>,
-    <sigma>]) and the rest of the indices select the data point.  If
-    passed a single array with 1 dimension, then each point is
-    considered to have only one value (i.e., by default the values
-    will be plotted against their indices).  If the routine is passed
-    more than one array, they must have identical shapes, and then
-    each data point is composed of one point from each array.  E.g.,
-    'Data(x,x**2)' is a 'PlotItem' that represents x squared as a
-    function of x.  For the output format, see the comments for
-    'write_array()'.
+def _is_binary(dtype):
+    """Return true iff data of numpy 'dtype' can be sent in binary format.
 
-    How the data are written to gnuplot depends on the 'inline'
-    argument and preference settings for the platform in use.
+    (Signed or unsigned) integers and booleans of any size can be sent
+    without conversion, but gnuplot only understands single- and
+    double-precision floats.
 
-    Keyword arguments:
+    """
 
-        'cols=<tuple>' -- write only the specified columns from each
-            data point to the file.  Since cols is used by python, the
-            columns should be numbered in the python style (starting
-            from 0), not the gnuplot style (starting from 1).
+    if dtype.kind == 'f':
+        return dtype.itemsize == 4 or dtype.itemsize == 8
+    else:
+        return dtype.kind in 'biu'
 
-        'inline=<bool>' -- transmit the data to gnuplot 'inline'
-            rather than through a temporary file.  The default is the
-            value of gp.GnuplotOpts.prefer_inline_data.
 
-        'filename=<string>' -- save data to a permanent file.
+def _binary_dtype(dtype, default=numpy.float32):
+    """Return the type to which data of numpy 'dtype' must be converted.
 
-    The keyword arguments recognized by '_FileItem' can also be used
-    here.
+    Types that can be sent in binary format are returned unchanged.
+    Floats narrower than single precision are widened to 'float32' and
+    floats wider than double precision are narrowed to 'float64'; any
+    other type becomes 'default'.
 
     """
 
-    if len(data) == 1:
-        # data was passed as a single structure
-        data = utils.float_array(data[0])
-
-        # As a special case, if passed a single 1-D array, then it is
-        # treated as one value per point (by default, plotted against
-        # its index):
-        if len(data.shape) == 1:
-            data = data[:,numpy.newaxis]
+    if _is_binary(dtype):
+        return dtype
+    elif dtype.kind == 'f' and dtype.itemsize < 4:
+        return numpy.dtype(numpy.float32)
+    elif dtype.kind == 'f':
+        return numpy.dtype(numpy.float64)
     else:
-        # data was passed column by column (for example,
-        # Data(x,y)); pack it into one big array (this will test
-        # that sizes are all the same):
-        data = utils.float_array(data)
-        dims = len(data.shape)
-        # transpose so that the last index selects x vs. y:
-        data = numpy.transpose(data, (dims-1,) + tuple(range(dims-1)))
-    if 'cols' in keyw:
-        cols = keyw['cols']
-        del keyw['cols']
-        if isinstance(cols, types.IntType):
-            cols = (cols,)
-        data = numpy.take(data, cols, -1)
+        return numpy.dtype(default)
 
-    if 'filename' in keyw:
-        filename = keyw['filename'] or None
-        del keyw['filename']
-    else:
-        filename = None
 
-    if 'inline' in keyw:
-        inline = keyw['inline']
-        del keyw['inline']
-        if inline and filename:
-            raise Errors.OptionError(
-                'cannot pass data both inline and via a file'
-                )
-    else:
-        inline = (not filename) and gp.GnuplotOpts.prefer_inline_data
+def _binary_type(dtype):
+    """Return the gnuplot name of the binary type for numpy 'dtype'.
 
-    # Output the content into a string:
-    f = StringIO()
-    utils.write_array(f, data)
-    content = f.getvalue()
-    if inline:
-        return _InlineFileItem(content, **keyw)
-    elif filename:
-        return _NewFileItem(content, filename=filename, **keyw)
-    elif gp.GnuplotOpts.prefer_fifo_data:
-        return _FIFOFileItem(content, **keyw)
+    Single- and double-precision floats and (signed or unsigned)
+    integer types of any size are passed through as such (e.g.,
+    'float64', 'int16', 'uint8'); booleans are sent as 'uint8'.  Other
+    types raise 'DataError' (see '_binary_dtype()').
+
+    """
+
+    if dtype.kind == 'f' and _is_binary(dtype):
+        return 'float%d' % (8 * dtype.itemsize,)
+    elif dtype.kind == 'i':
+        return 'int%d' % (8 * dtype.itemsize,)
+    elif dtype.kind == 'u' or dtype.kind == 'b':
+        return 'uint%d' % (8 * dtype.itemsize,)
     else:
-        return _NewFileItem(content, **keyw)
+        raise Errors.DataError(
+            'data of type %s cannot be sent in binary format' % (dtype,))
 
 
-def GridData(
-    data, xvals=None, yvals=None, inline=_unset, filename=None, **keyw
-    ):
-    """Return a _FileItem representing a function of two variables.
+def _binary_record_spec(shape, dtype, skip=0):
+    """Return the general binary keywords describing an array.
 
-    'GridData' represents a function that has been tabulated on a
-    rectangular grid.  The data are written to a file; no copy is kept
-    in memory.
+    'shape' and 'dtype' are the shape and numpy dtype of a C-ordered,
+    contiguous array stored 'skip' bytes into a file.  The last index
+    of the array selects the value within a data point, and the other
+    indices select the data point, as for 'write_array()'.  A
+    three-dimensional array is described as a two-dimensional grid of
+    records (the equivalent of the blank-line separated blocks of the
+    text format).
 
-    Arguments:
+    """
 
-        'data' -- the data to plot: a 2-d array with dimensions
-            (numx,numy).
+    if len(shape) == 1:
+        shape = shape + (1,)
+    if len(shape) == 2:
+        record = '%d' % (shape[0],)
+    elif len(shape) == 3:
+        # gnuplot lists the most rapidly varying dimension first:
+        record = '%dx%d' % (shape[1], shape[0],)
+    else:
+        raise Errors.DataError(
+            'binary data must have two or three dimensions')
+    spec = ['record=%s' % (record,)]
+    if skip:
+        spec.append('skip=%d' % (skip,))
+    if not dtype.isnative:
+        spec.append('endian=%s' % ({'<' : 'little', '>' : 'big'}[dtype.byteorder],))
+    spec.append('format="%s"' % (('%' + _binary_type(dtype)) * shape[-1],))
+    return string.join(spec)
 
-        'xvals' -- a 1-d array with dimension 'numx'
 
-        'yvals' -- a 1-d array with dimension 'numy'
+def _memmap_location(data):
+    """Return (filename, offset) locating the bytes of 'data' on disk.
 
-        'binary=<bool>' -- send data to gnuplot in binary format?
+    If 'data' is a 'numpy.memmap' (or a view of one) whose contents
+    can be read directly from its file by gnuplot, return the name of
+    the file and the byte offset of the start of the array within the
+    file.  Otherwise return None.
 
-        'inline=<bool>' -- send data to gnuplot "inline"?
+    """
 
-        'filename=<string>' -- save data to a permanent file.
+    if not isinstance(data, numpy.memmap):
+        return None
+    buf = getattr(data, '_mmap', None)
+    if buf is None or not data.filename or data.mode == 'c':
+        # Not backed by a file, or changes are private to this process.
+        return None
+    if not data.flags.c_contiguous:
+        return None
+    # numpy maps the file starting at a multiple of the allocation
+    # granularity:
+    start = data.offset - data.offset % mmap.ALLOCATIONGRANULARITY
+    base = numpy.frombuffer(buf, numpy.uint8).__array_interface__['data'][0]
+    address = data.__array_interface__['data'][0]
+    return (data.filename, start + address - base)
+
+
+def _memmap_file_item(data, keyw):
+    """Return a _FileItem that lets gnuplot read memmap 'data' in place.
+
+    'keyw' are the remaining '_FileItem' options, after those that
+    require the data to be copied ('cols', 'filename', 'inline' and
+    'decimate') have been checked and removed by 'Data'.  Return None
+    if 'data' is not a suitable memmap.
 
-    Note the unusual argument order!  The data are specified *before*
-    the x and y values.  (This inconsistency was probably a mistake;
-    after all, the default xvals and yvals are not very useful.)
+    """
 
-    'data' must be a data array holding the values of a function
-    f(x,y) tabulated on a grid of points, such that 'data[i,j] ==
+    location = _memmap_location(data)
+    if location is None or not _is_binary(data.dtype) \
+       or len(data.shape) > 3:
+        return None
+    (filename, offset) = location
+    if 'title' not in keyw:
+        keyw['title'] = None
+    keyw['binary'] = _binary_record_spec(data.shape, data.dtype, offset)
+    return _FileItem(filename, **keyw)
+
+
+def NpyFile(filename, **keyw):
+    """Construct a _FileItem that plots a '.npy' file written by numpy.
+
+    The header of the file (as written by 'numpy.save()') is read to
+    determine the shape and type of the stored array, and gnuplot is
+    told to read the array directly from the file in its general binary
+    format.  No part of the array is read by Python.  The array is
+    interpreted as for 'Data': the last index selects the value within
+    a data point and a 1-d array holds one value per point.
+
+    A multidimensional array stored in Fortran order (as 'numpy.save()'
+    writes any transposed array) cannot be described to gnuplot this
+    way, because the values of a data point are not adjacent in the
+    file.  Such an array is instead memory-mapped and copied into C
+    order, a block of data points at a time, into a temporary file or
+    FIFO when the item is plotted.
+
+    The keyword arguments are the same as those of the _FileItem
+    constructor, except that 'binary' is set automatically.
+
+    """
+
+    from numpy.lib import format
+
+    if type(filename) is not types.StringType:
+        raise Errors.OptionError(
+            'Argument (%s) must be a filename' % (filename,)
+            )
+    f = open(filename, 'rb')
+    try:
+        version = format.read_magic(f)
+        if version == (1, 0):
+            (shape, fortran_order, dtype) = format.read_array_header_1_0(f)
+        else:
+            (shape, fortran_order, dtype) = format.read_array_header_2_0(f)
+        skip = f.tell()
+    finally:
+        f.close()
+
+    if not _is_binary(dtype):
+        raise Errors.DataError(
+            'cannot plot array of type %s from %s' % (dtype, filename,))
+    if fortran_order and len(shape) > 1:
+        keyw['binary'] = _binary_record_spec(shape, dtype)
+        if 'title' not in keyw:
+            keyw['title'] = filename
+        return _make_file_item(
+            _Content(_write_npy_c_order, filename), keyw)
+    keyw['binary'] = _binary_record_spec(shape, dtype, skip)
+    return _FileItem(filename, **keyw)
+
+
+def _write_npy_c_order(f, filename):
+    """Write the array in '.npy' file 'filename' to 'f' in C order.
+
+    The array is memory-mapped and copied a block of data points at a
+    time, so it is never all in memory.
+
+    """
+
+    a = numpy.load(filename, mmap_mode='r')
+    rows = max(utils.chunk_values // max(a[0].size, 1), 1)
+    for start in range(0, len(a), rows):
+        utils.write_binary(f, a[start:start + rows])
+
+
+def _record_columns(dtype):
+    """Return the columns of the records of structured type 'dtype'.
+
+    The result is a list of '(name, index, offset, type)' tuples, one
+    for each scalar value in a record, in field order: 'name' is the
+    name of the field holding the value, 'index' is the index of the
+    value within the field (None for a scalar field), 'offset' is its
+    byte offset within the record, and 'type' is its numpy dtype.
+
+    """
+
+    columns = []
+    for name in dtype.names:
+        (fieldtype, offset) = dtype.fields[name][:2]
+        base = fieldtype.base
+        if base.names is not None:
+            raise Errors.DataError('nested structured arrays not supported')
+        if fieldtype.shape:
+            for i in range(int(numpy.multiply.reduce(fieldtype.shape))):
+                columns.append((name, i, offset + i * base.itemsize, base))
+        else:
+            columns.append((name, None, offset, base))
+    return columns
+
+
+def _select_columns(columns, cols, names=None):
+    """Return the items of 'columns' selected by 'cols'.
+
+    'cols' is a tuple of column numbers or, if 'names' (a list of the
+    field names of the columns) is given, of field names.  A field
+    name selects all of the columns of that field.
+
+    """
+
+    if cols is None:
+        return columns
+    selected = []
+    for col in cols:
+        if type(col) is types.StringType:
+            if names is None or col not in names:
+                raise Errors.OptionError('cols=%s' % (cols,))
+            for i in range(len(columns)):
+                if names[i] == col:
+                    selected.append(columns[i])
+        else:
+            selected.append(columns[col])
+    return selected
+
+
+def _data_columns(data, cols=None):
+    """Return the arrays passed to 'Data' as a list of 1-d columns.
+
+    If 'data' (the sequence of arguments passed to 'Data') is a
+    single 1-d structured array, each scalar value in a record (see
+    '_record_columns') is a column; if it is several 1-d arrays, each
+    array is a column; and if it is a single 2-d array from which
+    'cols' are selected, each column of the array is a column.  The
+    columns are views of the original data, not copies.  'cols', if
+    not None, selects the columns to return (by number or, for a
+    structured array, by field name).  Return None if the data are
+    not of one of these forms.
+
+    """
+
+    if len(data) == 1:
+        a = numpy.asarray(data[0])
+        if a.dtype.names is not None:
+            if len(a.shape) != 1:
+                raise Errors.DataError(
+                    'structured arrays must be one-dimensional')
+            columns = []
+            names = []
+            for (name, index, offset, type) in _record_columns(a.dtype):
+                if index is None:
+                    columns.append(a[name])
+                else:
+                    columns.append(
+                        numpy.reshape(a[name], (len(a), -1))[:,index])
+                names.append(name)
+            return _select_columns(columns, cols, names)
+        elif cols is not None and len(a.shape) == 2:
+            columns = []
+            for i in range(a.shape[1]):
+                columns.append(a[:,i])
+            return _select_columns(columns, cols)
+        else:
+            return None
+    else:
+        columns = map(numpy.asarray, data)
+        for column in columns:
+            if len(column.shape) != 1 or len(column) != len(columns[0]):
+                return None
+        return _select_columns(columns, cols)
+
+
+def _write_columns(f, columns, missing=None, precision=None):
+    """Write a list of 1-d column arrays to 'f' as text.
+
+    The columns are interleaved a chunk of rows at a time, so no copy
+    of the whole data is made.  The output is the same as that of
+    'utils.write_array()' for the 2-d array of the columns (with
+    NaN values written as 'missing', if it is not None, and with
+    'precision' significant digits).
+
+    """
+
+    rows = max(utils.chunk_values // len(columns), 1)
+    for start in range(0, len(columns[0]), rows):
+        chunk = []
+        for column in columns:
+            chunk.append(column[start:start + rows])
+        utils.write_rows(
+            f, numpy.transpose(utils.float_array(chunk)),
+            missing=missing, precision=precision)
+    f.write('\n')
+
+
+def _write_columns_binary(f, columns, dtype):
+    """Write a list of 1-d column arrays to 'f' as binary records.
+
+    'dtype' is the structured type of a record, with one field per
+    column.  The records are assembled a chunk at a time.
+
+    """
+
+    rows = max(utils.chunk_values // len(columns), 1)
+    buf = numpy.zeros((min(rows, len(columns[0])),), dtype)
+    for start in range(0, len(columns[0]), rows):
+        block = buf[:len(columns[0][start:start + rows])]
+        for i in range(len(columns)):
+            block[dtype.names[i]] = columns[i][start:start + rows]
+        utils.write_binary(f, block)
+
+
+def _binary_format(types):
+    """Return the general binary 'format' keyword for a list of dtypes."""
+
+    format = []
+    for type in types:
+        format.append('%' + _binary_type(type))
+    return 'format="%s"' % (string.join(format, ''),)
+
+
+def _binary_record_content(a, cols, keyw):
+    """Return content that sends structured array 'a' in place.
+
+    The general binary format describes the layout of the records of
+    'a', skipping padding and unselected fields (with '%*<n>uchar'),
+    so that its buffer can be written without any copy.  If 'cols'
+    asks for the fields in another order than their order in memory,
+    a 'using' option is added to put them back in order.  Set
+    keyw['binary'] (and maybe keyw['using']) and return the content,
+    or return None if 'a' cannot be sent in place.
+
+    """
+
+    if len(a.shape) != 1 or not a.flags.c_contiguous:
+        return None
+    columns = _record_columns(a.dtype)
+    names = map(lambda column: column[0], columns)
+    selected = _select_columns(columns, cols, names)
+    inorder = selected[:]
+    inorder.sort(lambda c1, c2: cmp(c1[2], c2[2]))
+
+    format = []
+    pos = 0
+    byteorders = {}
+    for (name, index, offset, type) in inorder:
+        if offset < pos or not _is_binary(type):
+            # Selected more than once, or not representable:
+            return None
+        if offset > pos:
+            format.append('%%*%duchar' % (offset - pos,))
+        format.append('%' + _binary_type(type))
+        if type.itemsize > 1:
+            byteorders[type.isnative and '=' or type.byteorder] = 1
+        pos = offset + type.itemsize
+    if pos < a.dtype.itemsize:
+        format.append('%%*%duchar' % (a.dtype.itemsize - pos,))
+    if len(byteorders) > 1:
+        return None
+
+    spec = ['record=%d' % (len(a),)]
+    if byteorders.keys() and byteorders.keys()[0] != '=':
+        spec.append('endian=%s' % (
+            {'<' : 'little', '>' : 'big'}[byteorders.keys()[0]],))
+    spec.append('format="%s"' % (string.join(format, ''),))
+
+    if inorder != selected:
+        if 'using' in keyw:
+            return None
+        using = []
+        for column in selected:
+            using.append(inorder.index(column) + 1)
+        keyw['using'] = tuple(using)
+    keyw['binary'] = string.join(spec)
+    return _Content(utils.write_binary, a)
+
+
+def _binary_data_content(data, cols, keyw):
+    """Return content that sends the arrays passed to 'Data' in binary.
+
+    Structured arrays and sequences of 1-d columns are sent column by
+    column, in the type of each column, without first being packed
+    into one 2-d array (see '_data_columns').  Set keyw['binary'] and
+    return the content, or return None if 'data' are not of that form.
+
+    """
+
+    if len(data) == 1:
+        a = numpy.asarray(data[0])
+        if a.dtype.names is not None:
+            content = _binary_record_content(a, cols, keyw)
+            if content is not None:
+                return content
+    columns = _data_columns(data, cols)
+    if columns is None:
+        return None
+    fields = []
+    types = []
+    for i in range(len(columns)):
+        type = columns[i].dtype
+        type = _binary_dtype(type, numpy.float64)
+        type = type.newbyteorder('=')
+        fields.append(('f%d' % (i,), type))
+        types.append(type)
+    keyw['binary'] = 'record=%d %s' % (len(columns[0]), _binary_format(types),)
+    return _Content(_write_columns_binary, columns, numpy.dtype(fields))
+
+
+def _pack_data(data, cols=None, decimate=None, convert=utils.float_array):
+    """Return the arrays passed to 'Data' as one array of data points.
+
+    'data' is the sequence of arguments passed to 'Data'.  In the
+    result, the last index selects the value within a data point.
+    'cols', if not None, is a tuple of the columns to retain.
+    'decimate', if not None, is a tuple '(n, method)' requesting that
+    the data points be reduced to about 'n' (see 'decimation.py').
+    'convert' is used to turn the data into an array; pass
+    'numpy.asarray' to keep their type.
+
+    """
+
+    columns = _data_columns(data, cols)
+    if columns is not None:
+        # Structured array or separate columns:
+        data = numpy.transpose(convert(columns))
+    elif len(data) == 1:
+        # data was passed as a single structure
+        data = convert(data[0])
+
+        # As a special case, if passed a single 1-D array, then it is
+        # treated as one value per point (by default, plotted against
+        # its index):
+        if len(data.shape) == 1:
+            data = data[:,numpy.newaxis]
+    else:
+        # data was passed column by column (for example,
+        # Data(x,y)); pack it into one big array (this will test
+        # that sizes are all the same):
+        data = convert(data)
+        dims = len(data.shape)
+        # transpose so that the last index selects x vs. y:
+        data = numpy.transpose(data, (dims-1,) + tuple(range(dims-1)))
+    if cols is not None and columns is None:
+        data = numpy.take(data, cols, -1)
+    if decimate is not None:
+        if len(data.shape) != 2:
+            raise Errors.DataError('only 2-d data can be decimated')
+        (n, method) = decimate
+        data = decimation.decimate(data, n, method)
+    return data
+
+
+def _packed_shape(data, cols=None):
+    """Return the shape that '_pack_data(data, cols)' would have.
+
+    The shape is worked out from the shapes of the arrays alone, so
+    that no packed copy of the data needs to be made.
+
+    """
+
+    if len(data) == 1:
+        shape = data[0].shape
+        if len(shape) == 1:
+            shape = shape + (1,)
+    else:
+        for d in data[1:]:
+            if d.shape != data[0].shape:
+                raise Errors.DataError(
+                    'the arrays passed to Data must have the same shape')
+        # See the transposition in _pack_data():
+        shape = (len(data),) + data[0].shape
+        shape = shape[-1:] + shape[:-1]
+    if cols is not None:
+        shape = shape[:-1] + (len(cols),)
+    return shape
+
+
+def _check_data(data, cols=None, decimate=None, missing=None):
+    """Check that the arrays passed to 'Data' can be written.
+
+    The data are only converted and formatted when they are plotted,
+    perhaps in a '_FIFOWriter' thread whose errors cannot reach the
+    caller, so whatever can be checked from the shapes and types of
+    the arrays alone is checked by the constructor.  Raise
+    'DataError' if there are no data points, if data that are to be
+    split or decimated are not 2-d, or if the values are not numbers.
+
+    """
+
+    data = map(numpy.asarray, data)
+    columns = _data_columns(data, cols)
+    if columns is not None:
+        shape = (len(columns[0]), len(columns))
+        types = map(lambda column: column.dtype, columns)
+    else:
+        shape = _packed_shape(data, cols)
+        types = map(lambda d: d.dtype, data)
+    if 0 in shape:
+        raise Errors.DataError('no data points to plot')
+    if missing == 'split' and len(shape) != 2:
+        raise Errors.DataError('only 2-d data can be split')
+    if decimate is not None and len(shape) != 2:
+        raise Errors.DataError('only 2-d data can be decimated')
+    for type in types:
+        if type.kind not in 'biufO':
+            raise Errors.DataError('cannot plot data of type %s' % (type,))
+
+
+def _write_data_binary(f, data, cols, dtype):
+    """Write the arrays passed to 'Data' to file 'f' in binary.
+
+    The data are packed (see '_pack_data()') when they are written,
+    then converted to 'dtype' and written a chunk of data points at a
+    time.  A single array from which no columns are selected is
+    packed without a copy.
+
+    """
+
+    data = _pack_data(data, cols, convert=numpy.asarray)
+    rows = max(utils.chunk_values // max(data[:1].size, 1), 1)
+    for start in range(0, len(data), rows):
+        utils.write_binary(
+            f, numpy.ascontiguousarray(data[start:start + rows], dtype))
+
+
+def _write_data(f, data, cols=None, decimate=None, missing=None,
+                precision=None):
+    """Write the arrays passed to 'Data' to file 'f' as text.
+
+    'missing' is the string to write in place of NaN values, or
+    'split' to leave out the data points containing NaN (see 'Data').
+    'precision' is the number of significant digits to write, or None
+    (see 'utils.value_format()').
+
+    """
+
+    if missing == 'split':
+        data = _pack_data(data, cols, decimate)
+        if len(data.shape) != 2:
+            raise Errors.DataError('only 2-d data can be split')
+        utils.write_array_split(f, data, precision)
+        return
+    if decimate is None:
+        columns = _data_columns(data, cols)
+        if columns is not None:
+            _write_columns(f, columns, missing, precision)
+            return
+    utils.write_array(
+        f, _pack_data(data, cols, decimate),
+        missing=missing, precision=precision)
+
+
+def Data(*data, **keyw):
+    """Create and return a _FileItem representing the data from *data.
+
+    Create a '_FileItem' object (which is a type of 'PlotItem') out of
+    one or more Float Python numpy arrays (or objects that can be
+    converted to a float numpy array).  If the routine is passed a
+    single with multiple dimensions, then the last index ranges over
+    the values comprising a single data point (e.g., [<x>, <y>,
+    <sigma>]) and the rest of the indices select the data point.  If
+    passed a single array with 1 dimension, then each point is
+    considered to have only one value (i.e., by default the values
+    will be plotted against their indices).  If the routine is passed
+    more than one array, they must have identical shapes, and then
+    each data point is composed of one point from each array.  E.g.,
+    'Data(x,x**2)' is a 'PlotItem' that represents x squared as a
+    function of x.  For the output format, see the comments for
+    'write_array()'.
+
+    A single one-dimensional numpy structured (record) array is
+    treated as one data point per record, with one value per field
+    (or one value per element of a field that is itself an array).
+    Structured arrays and one-dimensional column arrays are never
+    packed into one big array: they are interleaved a chunk of rows
+    at a time as they are written.
+
+    How the data are written to gnuplot depends on the 'inline'
+    argument and preference settings for the platform in use.  Text
+    data are not formatted until the item is first plotted (the result
+    is then kept for replotting), so the arrays should not be modified
+    in the meantime.
+
+    Keyword arguments:
+
+        'cols=<tuple>' -- write only the specified columns from each
+            data point to the file.  Since cols is used by python, the
+            columns should be numbered in the python style (starting
+            from 0), not the gnuplot style (starting from 1).  For a
+            structured array, columns can also be selected by field
+            name.
+
+        'inline=<bool>' -- transmit the data to gnuplot 'inline'
+            rather than through a temporary file.  The default is the
+            value of gp.GnuplotOpts.prefer_inline_data.
+
+        'filename=<string>' -- save data to a permanent file.
+
+        'binary=<bool>' -- send the raw bytes of the array to gnuplot
+            (in gnuplot's general binary format) rather than
+            formatting it as text.  This is much faster for large
+            arrays, but cannot be combined with inline data and needs
+            gnuplot 4.2 or later (see
+            gp.GnuplotOpts.recognizes_general_binary).  Integer data
+            are sent as integers of the same size (e.g., 'uint8' or
+            'int16') rather than being converted to floats.  If
+            several columns of different types are passed, each keeps
+            its own type.  A contiguous structured array is sent
+            straight from its buffer, with the general binary format
+            describing the layout of its records (fields that are
+            not selected by 'cols', and padding, are skipped by
+            gnuplot).  Other arrays are packed and converted only as
+            they are written, so they should not be modified before
+            they are plotted either.
+
+        'decimate=<int>' -- reduce the data to about this many points
+            before sending them to gnuplot, choosing the points so
+            that the plot looks the same (typically about twice the
+            width of the plot in pixels is enough).  The data must be
+            2-d, with x values in the first column and y values in
+            the second (after 'cols' is applied); see 'decimation.py'.
+            If there is only one column, the points' indices are
+            added as a new first column.
+
+        'decimate="auto"' -- like 'decimate=<int>', but the number of
+            points is worked out each time the item is plotted from
+            the size of the plot and the current xrange (see
+            'Gnuplot.resolution' and 'termdefs.get_resolution()'), and
+            only the points within the xrange are sent.  Thus a plot
+            on the screen or a small png receives only a few thousand
+            points, while a postscript hardcopy receives all of them.
+            The x values must be sorted.  The full data are kept in
+            memory for the lifetime of the item.
+
+        'decimate_method=<string>' -- the decimation method:
+            'minmax' (the default) keeps the smallest and largest y
+            value in each group of consecutive points; 'lttb' uses the
+            largest-triangle-three-buckets algorithm.
+
+        'missing=<string>' -- write NaN values as this string (e.g.,
+            '?') and tell gnuplot that it marks a missing value (see
+            gnuplot's 'set datafile missing').  Not allowed with
+            binary data.
+
+        'missing="split"' -- leave out the data points that contain
+            NaN, breaking the data into separate segments (separated
+            by blank lines) at those points, so that gnuplot does not
+            draw lines across the gaps.  The data must be 2-d.
+
+        'precision=<int>' -- write text data with at most this many
+            significant digits (e.g., 6 for '%.6g') rather than the
+            12 digits written by '%s'.  This typically halves the
+            amount of text to format and send, which matters most for
+            inline data.  The default is the value of
+            gp.GnuplotOpts.text_precision.  Beware that the x values
+            of long series (e.g., times in seconds since 1970) may
+            need more digits than the y values.
+
+    Masked values of 'numpy.ma' masked arrays are turned into NaN.  By
+    default NaN values are written as they are ('nan' in text, or
+    NaN in binary), and gnuplot treats them as undefined points.
+
+    If 'binary=1' and the data are a single 'numpy.memmap' array
+    (e.g., from 'numpy.load(filename, mmap_mode="r")'), gnuplot is
+    told to read the data directly from the memory-mapped file, and no
+    copy of the data is made at all.  This is not possible if 'cols',
+    'inline', 'filename' or 'decimate' is specified, if the array is
+    not stored contiguously, or if it was mapped with 'mode="c"'.  See
+    also 'NpyFile'.
+
+    The keyword arguments recognized by '_FileItem' can also be used
+    here.
+
+    """
+
+    # Masked values become NaN:
+    data = map(utils.fill_masked, data)
+
+    missing = keyw.get('missing')
+    if 'missing' in keyw:
+        del keyw['missing']
+
+    precision = _get_precision(keyw)
+    cols = _get_cols(keyw)
+
+    if keyw.get('decimate'):
+        # decimate[0] is an int or 'auto':
+        decimate = (keyw['decimate'], keyw.get('decimate_method', 'minmax'))
+        if decimate[0] != 'auto' and type(decimate[0]) is not types.IntType:
+            raise Errors.OptionError('decimate=%s' % (decimate[0],))
+        if decimate[1] not in decimation.methods:
+            raise Errors.OptionError('decimate_method=%s' % (decimate[1],))
+    else:
+        decimate = None
+    for opt in ['decimate', 'decimate_method']:
+        if opt in keyw:
+            del keyw[opt]
+
+    binary = keyw.get('binary', 0)
+    (inline, filename) = _get_output_options(keyw, binary)
+
+    if missing is not None:
+        if binary:
+            # NaN is already undefined in binary data:
+            raise Errors.OptionError(
+                'missing=%s is not possible with binary data' % (missing,))
+        if decimate is not None and decimate[0] == 'auto':
+            raise Errors.OptionError(
+                'missing=%s cannot be combined with decimate="auto"'
+                % (missing,))
+
+    _check_data(data, cols, decimate, missing)
+
+    if len(data) == 1 and binary and cols is None and decimate is None \
+       and not (inline or filename):
+        item = _memmap_file_item(data[0], keyw)
+        if item is not None:
+            return item
+
+    if decimate is not None and decimate[0] == 'auto':
+        # The points are selected anew whenever the resolution of the
+        # plot changes:
+        data = _pack_data(data, cols)
+        if len(data.shape) != 2:
+            raise Errors.DataError('only 2-d data can be decimated')
+        content = _DecimatedContent(data, decimate[1], binary, precision)
+        if binary:
+            keyw['binary'] = _binary_record_spec(
+                content.value.shape, content.value.dtype)
+    elif binary:
+        # The raw bytes of the array are written straight from its
+        # buffer, in their own type if possible:
+        if decimate is None:
+            content = _binary_data_content(data, cols, keyw)
+        else:
+            content = None
+        if content is None and decimate is None:
+            # Only the shape and type of the packed data are needed
+            # now; they are packed when they are written:
+            data = map(numpy.asarray, data)
+            dtype = _binary_dtype(numpy.result_type(*data))
+            keyw['binary'] = _binary_record_spec(
+                _packed_shape(data, cols), dtype)
+            content = _Content(_write_data_binary, data, cols, dtype)
+        elif content is None:
+            # The number of points is only known after decimating, so
+            # this is done here (leaving just a few points to keep):
+            data = numpy.ascontiguousarray(_pack_data(data, cols, decimate))
+            keyw['binary'] = _binary_record_spec(data.shape, data.dtype)
+            content = _Content(utils.write_binary, data)
+    else:
+        # The data are only converted and formatted when they are
+        # first plotted:
+        data = map(numpy.asarray, data)
+        for d in data[1:]:
+            if d.shape != data[0].shape:
+                raise Errors.DataError(
+                    'the arrays passed to Data must have the same shape')
+        content = _CachedContent(
+            _write_data, data, cols, decimate, missing, precision)
+    item = _make_file_item(content, keyw, inline, filename)
+    if missing != 'split':
+        item.missing = missing
+    return item
+
+
+class _ChunkWriter:
+    """Write the row chunks produced by an iterable as gnuplot text.
+
+    An instance is used as the content of a '_FileItem' (see
+    '_write_content()').  Each chunk is converted and formatted as soon
+    as it is produced and then discarded, so only one chunk needs to
+    be in memory at a time.
+
+    Members:
+
+        'chunks' -- an iterable producing the chunks, or a callable
+            returning such an iterable.  An iterable can only be
+            written once; it is set to 'None' when it has been used.
+
+        'cols' -- a tuple of the columns to write, or 'None' to write
+            all columns.
+
+        'precision' -- the number of significant digits to write, or
+            'None' (see 'utils.value_format()').
+
+    """
+
+    def __init__(self, chunks, cols=None, precision=None):
+        self.chunks = chunks
+        self.cols = cols
+        self.precision = precision
+
+    def check(self):
+        """Raise 'DataError' if the data can no longer be written."""
+
+        if self.chunks is None:
+            raise Errors.DataError(
+                'the data stream has already been consumed')
+
+    def __call__(self, f):
+        self.check()
+        if callable(self.chunks):
+            chunks = self.chunks()
+        else:
+            (chunks, self.chunks) = (self.chunks, None)
+
+        for chunk in chunks:
+            chunk = utils.float_array(chunk)
+            if len(chunk.shape) == 1:
+                chunk = chunk[:,numpy.newaxis]
+            elif len(chunk.shape) != 2:
+                raise Errors.DataError(
+                    'each chunk of a data stream must be a 1-d or 2-d array')
+            if self.cols is not None:
+                chunk = numpy.take(chunk, self.cols, -1)
+            if len(chunk):
+                utils.write_rows(f, chunk, precision=self.precision)
+        f.write('\n')
+
+
+def StreamData(chunks, **keyw):
+    """Create and return a _FileItem whose data are produced incrementally.
+
+    'StreamData' is like 'Data', except that the data are not passed
+    as one array but produced by 'chunks', an iterable (e.g., a
+    generator) yielding successive blocks of data points.  Each block
+    is a 2-d array (or anything that can be converted to one) whose
+    rows are data points, or a 1-d array of single values.  The blocks
+    are written to gnuplot as they are produced, so the memory needed
+    is bounded by the size of one block rather than by the size of the
+    whole dataset.  For example::
+
+        def read_log(f):
+            while 1:
+                block = numpy.fromfile(f, numpy.float64, 2 * 100000)
+                if not len(block):
+                    break
+                yield numpy.reshape(block, (-1, 2))
+
+        g.plot(Gnuplot.StreamData(read_log(open('sensor.log', 'rb'))))
+
+    An iterator can only be read once, so such an item can only be
+    plotted once (unless the data are saved to a file; see below).  If
+    'chunks' is instead a callable object, it is called each time the
+    data are needed and must return a fresh iterable.  Thus
+    'StreamData(lambda: read_log(open("sensor.log", "rb")))' can be
+    replotted as often as desired.
+
+    Keyword arguments:
+
+        'cols=<tuple>' -- write only the specified columns from each
+            data point (numbered starting from 0, as for 'Data').
+
+        'inline=<bool>' -- write the data to gnuplot's command pipe
+            as they are produced rather than through a FIFO or file.
+
+        'filename=<string>' -- write the data to a permanent file.
+
+        'precision=<int>' -- as for 'Data'.
+
+    If the data are neither inline nor passed through a FIFO, they are
+    written to a temporary file the first time the item is plotted,
+    and that file is reused for replotting (with 'filename', they are
+    written to that file when the item is created).  The data are
+    always sent as text.  The keyword arguments recognized by
+    '_FileItem' can also be used here.
+
+    """
+
+    cols = _get_cols(keyw)
+
+    if keyw.get('binary', 0):
+        raise Errors.OptionError('binary streamed data not supported')
+
+    precision = _get_precision(keyw)
+    (inline, filename) = _get_output_options(keyw)
+
+    return _make_file_item(
+        _ChunkWriter(chunks, cols, precision), keyw, inline, filename)
+
+
+class _SeriesContent:
+    """The points of a 'TimeSeries' selected for the current plot.
+
+    Members:
+
+        'pyramid' -- the 'decimation.MinMaxPyramid' of the series.
+
+        'binary' -- true if the points are written in binary.
+
+        'precision' -- the precision of text data (see
+            'utils.value_format()').
+
+        'value' -- the points selected for the current resolution.
+
+    """
+
+    def __init__(self, pyramid, binary, precision=None):
+        self.pyramid = pyramid
+        self.binary = binary
+        self.precision = precision
+        self.resolution = None
+        self.set_resolution(
+            termdefs.get_resolution(gp.GnuplotOpts.default_term), None)
+
+    def set_resolution(self, width, xrange):
+        """Select the points to plot; return true if they changed."""
+
+        if (width, xrange) == self.resolution:
+            return 0
+        self.resolution = (width, xrange)
+        if xrange is None:
+            xrange = (None, None)
+        self.value = self.pyramid.select(xrange[0], xrange[1], width)
+        return 1
+
+    def get_binary_spec(self):
+        """Return the general binary keywords for the data, or None."""
+
+        if self.binary:
+            return _binary_record_spec(self.value.shape, self.value.dtype)
+        else:
+            return None
+
+    def snapshot(self):
+        """Return content that writes the points selected just now.
+
+        The selection changes with the next 'set_resolution()', but
+        the returned content does not, so it can be written later
+        (e.g., by a '_FIFOWriter') while the item is plotted again.
+
+        """
+
+        if self.binary:
+            return _Content(utils.write_binary, self.value)
+        else:
+            return _Content(_write_text, self.value, self.precision)
+
+    def __call__(self, f):
+        self.snapshot()(f)
+
+
+def TimeSeries(*data, **keyw):
+    """Create a _FileItem for zooming around in a very long series.
+
+    'TimeSeries(y)' or 'TimeSeries(x, y)' represents the 1-d array
+    'y', plotted against 'x' (which must be sorted) or against its
+    index.  When the item is created, an index of the minimum and
+    maximum of the series over buckets of 'branching**k' points is
+    built (see 'decimation.MinMaxPyramid').  Each time the item is
+    plotted, only the points within the current xrange (see
+    'Gnuplot.xrange') are sent: unchanged if there are few enough of
+    them, otherwise the minimum and maximum of each bucket of the
+    coarsest level that still has at least as many buckets as the
+    plot has pixels (see 'Gnuplot.resolution').  Thus zooming and
+    panning with 'set_range("xrange", ...)' and 'refresh()' cost about
+    the same however long the series is, and the arrays can be
+    memory-mapped files (e.g., from 'numpy.load(..., mmap_mode="r")')
+    of which only the parts needed are read.
+
+    Keyword arguments:
+
+        'branching=<int>' -- the number of buckets of one level of
+            the index that make up a bucket of the next (default 4).
+            The index takes about 2/(branching-1) times the memory
+            of 'y'.
+
+        'index_file=<string>' -- store the index in memory-mapped
+            files '<index_file>.<k>.npy'.  If they already exist (from
+            an earlier run), they are reused rather than rebuilt.
+            They are not checked against the data except for their
+            size, so use a different name for different data.
+
+        'inline=<bool>' -- send the points to gnuplot 'inline'.
+
+        'filename=<string>' -- write the points to a permanent file
+            (rewritten whenever the selection changes).
+
+        'binary=<bool>' -- send the points in gnuplot's general
+            binary format.
+
+        'precision=<int>' -- as for 'Data'.
+
+    The keyword arguments recognized by '_FileItem' can also be used
+    here; 'with_="lines"' is usual.
+
+    """
+
+    if len(data) == 1:
+        (x, y) = (None, data[0])
+    elif len(data) == 2:
+        (x, y) = data
+        x = numpy.asarray(x)
+    else:
+        raise Errors.DataError('TimeSeries takes one or two arrays')
+    y = numpy.asarray(y)
+    if len(y.shape) != 1 or (x is not None and x.shape != y.shape):
+        raise Errors.DataError(
+            'TimeSeries data must be 1-d arrays of the same length')
+
+    branching = keyw.get('branching', 4)
+    index_file = keyw.get('index_file')
+    for opt in ['branching', 'index_file']:
+        if opt in keyw:
+            del keyw[opt]
+    precision = _get_precision(keyw)
+
+    binary = keyw.get('binary', 0)
+    (inline, filename) = _get_output_options(keyw, binary)
+
+    content = _SeriesContent(
+        decimation.MinMaxPyramid(x, y, branching, index_file), binary,
+        precision)
+    if binary:
+        keyw['binary'] = content.get_binary_spec()
+    return _make_file_item(content, keyw, inline, filename)
+
+
+class Datablock(_FileItem):
+    """Data uploaded once to gnuplot as a named datablock.
+
+    A 'Datablock' is constructed from arrays in the same way as
+    'Data', but its data are sent to gnuplot as a datablock (gnuplot's
+    '$name << EOD' syntax, available in gnuplot 5.0 and later) the
+    first time the item is plotted by a particular gnuplot process.
+    From then on the plot command just refers to the datablock by
+    name, so that replotting the item--for example with 'replot',
+    'hardcopy', or after changing its options with 'set_option'--does
+    not send the data again.  Example::
+
+        d = Gnuplot.Datablock(x, y, with_='lines')
+        g.plot(d)                       # sends the data
+        g.hardcopy('plot.ps')           # just replots '$Gnuplot_py_1'
+        g.hardcopy('plot.png', terminal='png')
+
+    Keyword arguments:
+
+        'name=<string>' -- the name of the datablock, which must start
+            with '$'.  By default a unique name is generated.  Since
+            gnuplot keeps every datablock until it exits, plots that
+            are regenerated repeatedly should reuse a fixed name;
+            defining a datablock replaces any old one of the same name.
+            Items that share a name send their data again whenever
+            another item has replaced the datablock in the meantime.
+
+        'cols=<tuple>', 'missing=<string>', 'precision=<int>' -- as
+            for 'Data'.
+
+    The keyword arguments recognized by '_FileItem' (except 'binary')
+    can also be used here.  Use 'set_data' to replace the data.
+
+    """
+
+    _option_list = _FileItem._option_list.copy()
+    _option_list['binary'] = None
+
+    # Used to generate unique datablock names:
+    _count = 0
+
+    # For each gnuplot process, a dictionary mapping the name of each
+    # datablock that was sent to it to a weak reference to the content
+    # that was sent under that name:
+    _sent = weakref.WeakKeyDictionary()
+
+    def __init__(self, *data, **keyw):
+        name = keyw.get('name')
+        if name is None:
+            Datablock._count += 1
+            name = '$Gnuplot_py_%d' % (Datablock._count,)
+        else:
+            del keyw['name']
+            if name[:1] != '$':
+                raise Errors.OptionError(
+                    'datablock name must start with "$": %s' % (name,))
+
+        self.cols = _get_cols(keyw)
+        self.precision = _get_precision(keyw)
+
+        self.split = (keyw.get('missing') == 'split')
+        if 'missing' in keyw:
+            if not self.split:
+                self.missing = keyw['missing']
+            del keyw['missing']
+
+        if 'binary' in keyw:
+            if keyw['binary']:
+                raise Errors.OptionError(
+                    'binary data cannot be sent as a datablock')
+            del keyw['binary']
+
+        if 'title' not in keyw:
+            keyw['title'] = None
+
+        _FileItem.__init__(self, name, **keyw)
+        self.set_data(*data)
+
+    def set_data(self, *data):
+        """Replace the data; they are resent when next plotted."""
+
+        data = map(numpy.asarray, map(utils.fill_masked, data))
+        for d in data[1:]:
+            if d.shape != data[0].shape:
+                raise Errors.DataError(
+                    'the arrays passed to Datablock must have the same shape')
+        if self.split:
+            missing = 'split'
+        else:
+            missing = self.missing
+        _check_data(data, self.cols, None, missing)
+        self.content = _CachedContent(
+            _write_data, data, self.cols, None, missing, self.precision)
+
+    def get_base_command_string(self):
+        return self.filename
+
+    def define(self, f):
+        # The data have to be (re)sent unless this process's datablock
+        # of this name holds our current content; another 'Datablock'
+        # with the same name might have replaced it in the meantime:
+        sent = Datablock._sent.setdefault(f, {})
+        ref = sent.get(self.filename)
+        if ref is None or ref() is not self.content:
+            f.write('%s << EOD\n' % (self.filename,))
+            _write_content(f, self.content)
+            f.write('EOD\n')
+            sent[self.filename] = weakref.ref(self.content)
+
+
+class LiveData(_FileItem):
+    """Data that grow over time, stored in a file that is only appended to.
+
+    A 'LiveData' item is intended for plots that are updated
+    repeatedly as new data points arrive.  The data are kept in a file
+    that stays open; 'append()' writes only the new data points to the
+    end of the file, so the cost of an update is proportional to the
+    amount of new data rather than to the size of the whole dataset.
+    Gnuplot rereads the file each time the plot is refreshed.
+    Example::
+
+        live = Gnuplot.LiveData(with_='lines')
+        g.plot(live)
+        while 1:
+            (t, v) = read_samples()
+            g.append(live, t, v)        # append, then refresh the plot
+
+    The constructor takes initial data (optional) and the keyword
+    arguments 'cols', 'filename', 'binary' and 'precision' in the same
+    way as 'Data', and all arguments of '_FileItem'.  Inline data and FIFOs
+    are not used, because their data cannot be extended.  The data
+    must be 2-d, i.e., one row per data point.  If 'binary=1', the
+    type of the data is determined by the first rows appended, and the
+    item cannot be plotted until then ('DataError').
+
+    Members:
+
+        'count' -- the number of data points in the file.
+
+    """
+
+    def __init__(self, *data, **keyw):
+        self.cols = _get_cols(keyw)
+        if keyw.get('inline'):
+            raise Errors.OptionError('LiveData cannot be sent inline')
+        # (The data always go to a file, never inline:)
+        keyw['inline'] = 0
+        (inline, filename) = _get_output_options(keyw)
+        self.precision = _get_precision(keyw)
+
+        self.binary = keyw.get('binary', 0)
+        if self.binary:
+            mode = 'wb'
+            # the format is set when the first data are appended:
+            del keyw['binary']
+        else:
+            mode = 'w'
+
+        if filename:
+            self.temp = False
+        else:
+            self.temp = True
+            filename = _temp_file(self.binary)
+            if 'title' not in keyw:
+                keyw['title'] = None
+        self.file = open(filename, mode)
+        self.count = 0
+        self.dtype = None
+        self.columns = None
+
+        _FileItem.__init__(self, filename, **keyw)
+
+        if data:
+            self.append(*data)
+
+    def append(self, *data):
+        """Append data points to the file.
+
+        The arguments are interpreted as for 'Data'; each must have
+        the same number of columns as the data appended before.  The
+        plot is not refreshed (see 'Gnuplot.append()').
+
+        """
+
+        data = _pack_data(data, self.cols)
+        if len(data.shape) != 2:
+            raise Errors.DataError('LiveData data must be 2-d')
+        if self.columns is None:
+            self.columns = data.shape[1]
+        elif data.shape[1] != self.columns:
+            raise Errors.DataError(
+                'LiveData expected %d columns but got %d'
+                % (self.columns, data.shape[1],))
+
+        if self.binary:
+            if self.dtype is None:
+                self.dtype = data.dtype
+            utils.write_binary(self.file, data.astype(self.dtype))
+        elif len(data):
+            utils.write_rows(self.file, data, precision=self.precision)
+        self.file.flush()
+        self.count += len(data)
+
+        if self.binary:
+            self.set_option_binary(
+                _binary_record_spec((self.count, self.columns), self.dtype))
+
+    def get_base_command_string(self):
+        if self.binary and self.dtype is None:
+            # Without a binary format gnuplot would read the raw bytes
+            # as text:
+            raise Errors.DataError(
+                'binary LiveData cannot be plotted before data are appended')
+        return _FileItem.get_base_command_string(self)
+
+    def __del__(self):
+        self.file.close()
+        if self.temp:
+            os.unlink(self.filename)
+
+
+class RollingData(_FileItem):
+    """A rolling window holding the most recent data points.
+
+    A 'RollingData' item holds the last 'size' data points pushed into
+    it in a preallocated ring buffer, so that adding data never
+    allocates or moves old data.  'push()' can be called from any
+    thread.  Each time the item is plotted, the current contents of
+    the window (oldest point first) are sent to gnuplot through a FIFO
+    or inline.  The item is meant to be redrawn periodically by a
+    'Gnuplot.Refresher', which uses the 'version' member to skip
+    redraws when nothing has been pushed.  Example::
+
+        window = Gnuplot.RollingData(10000, 2, with_='lines')
+        g.plot(window)
+        refresher = Gnuplot.Refresher(g, rate=20)
+        ...
+        window.push(t, v)      # in a producer thread
+
+    Arguments:
+
+        'size' -- the number of data points in the window.
+
+        'columns' -- the number of values in each data point.
+
+    Keyword arguments:
+
+        'dtype=<dtype>' -- the numpy type of the buffer (default
+            'numpy.float64').
+
+        'binary=<bool>' -- send the window in gnuplot's general binary
+            format (requires FIFO support).
+
+        'inline=<bool>' -- send the window inline.  This is the
+            default if FIFOs are not supported or not preferred.
+
+        'precision=<int>' -- as for 'Data'.
+
+    The keyword arguments recognized by '_FileItem' can also be used
+    here.
+
+    Members:
+
+        'count' -- the number of data points currently in the window.
+
+        'version' -- incremented by each call of 'push()'.
+
+    """
+
+    def __init__(self, size, columns=1, **keyw):
+        dtype = keyw.get('dtype', numpy.float64)
+        if 'dtype' in keyw:
+            del keyw['dtype']
+
+        self.binary = keyw.get('binary', 0)
+        if 'binary' in keyw:
+            del keyw['binary']
+        self.precision = _get_precision(keyw)
+
+        fifo = gp.GnuplotOpts.support_fifo
+        if 'inline' in keyw:
+            self.inline = keyw['inline']
+            del keyw['inline']
+        else:
+            self.inline = not (fifo and gp.GnuplotOpts.prefer_fifo_data)
+        if self.binary and self.inline:
+            raise Errors.OptionError('binary inline data not supported')
+        dtype = numpy.dtype(dtype)
+        if self.binary and not _is_binary(dtype):
+            raise Errors.OptionError('dtype=%s' % (dtype,))
+        if not (self.inline or fifo):
+            raise Errors.OptionError(
+                'RollingData must be sent inline on this platform')
+
+        if 'title' not in keyw:
+            keyw['title'] = None
+
+        self.buffer = numpy.zeros((size, columns), dtype)
+        self.size = size
+        self.columns = columns
+        # The index in the buffer where the next point will be stored:
+        self.end = 0
+        self.count = 0
+        self.version = 0
+        self.lock = threading.Lock()
+
+        if self.inline:
+            _FileItem.__init__(self, '-', **keyw)
+        else:
+            _FileItem.__init__(self, '', **keyw)
+
+    def push(self, *data):
+        """Add data points to the window, discarding the oldest ones.
+
+        The arguments are either a single array of data points (or of
+        values, if 'columns' is 1) or one array or number per column;
+        e.g., 'push(t, v)' adds the single point '(t, v)'.
+
+        """
+
+        if len(data) == 1:
+            rows = numpy.asarray(data[0], self.buffer.dtype)
+        else:
+            rows = numpy.transpose(numpy.asarray(data, self.buffer.dtype))
+        if rows.ndim > 2 \
+           or (rows.ndim == 2 and rows.shape[1] != self.columns) \
+           or (rows.ndim == 1 and self.columns > 1
+               and rows.shape[0] != self.columns):
+            raise Errors.DataError(
+                'RollingData expected %d columns' % (self.columns,))
+        rows = numpy.reshape(rows, (-1, self.columns))
+        if len(rows) > self.size:
+            rows = rows[-self.size:]
+
+        n = len(rows)
+        self.lock.acquire()
+        try:
+            # Write in up to two pieces, wrapping around at the end:
+            first = min(n, self.size - self.end)
+            self.buffer[self.end:self.end + first] = rows[:first]
+            self.buffer[:n - first] = rows[first:]
+            self.end = (self.end + n) % self.size
+            self.count = min(self.count + n, self.size)
+            self.version += 1
+        finally:
+            self.lock.release()
+
+    def get_window(self):
+        """Return a copy of the data in the window, oldest first."""
+
+        self.lock.acquire()
+        try:
+            start = (self.end - self.count) % self.size
+            if start + self.count <= self.size:
+                return self.buffer[start:start + self.count].copy()
+            else:
+                return numpy.concatenate(
+                    (self.buffer[start:], self.buffer[:self.end]))
+        finally:
+            self.lock.release()
+
+    def get_base_command_string(self):
+        # Take a snapshot of the window, to be sent by a _FIFOWriter
+        # or by pipein():
+        self.snapshot = self.get_window()
+        if self.binary:
+            self.set_option_binary(
+                _binary_record_spec(self.snapshot.shape, self.snapshot.dtype))
+            fifo = _FIFOWriter(
+                _Content(utils.write_binary, self.snapshot), 'wb')
+        elif self.inline:
+            return _FileItem.get_base_command_string(self)
+        elif len(self.snapshot):
+            fifo = _FIFOWriter(
+                _Content(_write_text, self.snapshot, self.precision))
+        else:
+            # An empty window is sent as an empty block, as in pipein():
+            fifo = _FIFOWriter('')
+        self.snapshot = None
+        return gp.double_quote_string(fifo.filename)
+
+    def pipein(self, f):
+        if self.inline:
+            if len(self.snapshot):
+                _write_text(f, self.snapshot, self.precision)
+            f.write('e\n')
+            self.snapshot = None
+
+
+def _write_grid_binary(f, data, xvals, yvals, dtype=numpy.float32):
+    """Write grid data to 'f' in gnuplot's binary matrix format.
+
+    The values are written as 'dtype' (float32, which is what gnuplot
+    expects by default, or float64).  The matrix is written a block
+    of rows at a time, so no bordered copy of the whole grid is made.
+
+    """
+
+    (numx, numy) = data.shape
+
+    # It seems that the gnuplot documentation for binary mode
+    # disagrees with its actual behavior (as of v. 3.7).  The
+    # documentation has the roles of x and y exchanged.  We ignore
+    # the documentation and go with the code.
+
+    # The first row holds numx followed by the x values:
+    row = numpy.zeros((numx + 1,), dtype)
+    row[0] = numx
+    row[1:] = xvals
+    utils.write_binary(f, row)
+
+    # Each following row holds a y value followed by the data for
+    # that y:
+    rows = max(utils.chunk_values // (numx + 1), 1)
+    mout = numpy.zeros((min(rows, numy), numx + 1), dtype)
+    for start in range(0, numy, rows):
+        stop = min(start + rows, numy)
+        block = mout[:stop - start]
+        block[:,0] = yvals[start:stop]
+        block[:,1:] = numpy.transpose(data[:,start:stop])
+        utils.write_binary(f, block)
+
+
+def _grid_spacing(vals):
+    """Return '(origin, delta)' if 'vals' are equally spaced, else None."""
+
+    if len(vals) < 2:
+        return None
+    vals = numpy.asarray(vals, numpy.float64)
+    delta = (vals[-1] - vals[0]) / (len(vals) - 1)
+    error = numpy.absolute(vals - (vals[0] + delta * numpy.arange(len(vals))))
+    if delta == 0.0 or error.max() > 1e-9 * abs(vals[-1] - vals[0]):
+        return None
+    return (vals[0], delta)
+
+
+def _binary_grid_spec(data, xgrid, ygrid):
+    """Return the general binary keywords describing a uniform grid.
+
+    'data' is a C- or Fortran-contiguous 2-d array such that
+    'data[i,j]' is the value at 'x = x0 + i*dx' and 'y = y0 + j*dy',
+    where '(x0, dx) = xgrid' and '(y0, dy) = ygrid'.  gnuplot lists
+    the most rapidly varying dimension first.
+
+    """
+
+    (numx, numy) = data.shape
+    # Is y the most rapidly varying?
+    return _binary_array_spec(
+        numx, numy, data.flags.c_contiguous, xgrid, ygrid, data.dtype)
+
+
+def _binary_array_spec(numx, numy, scan_yx, xgrid, ygrid, dtype, values=1):
+    """Return the general binary keywords for a 'numx' by 'numy' array.
+
+    The array holds 'values' values of type 'dtype' for each point of
+    a uniform grid given by '(x0, dx) = xgrid' and '(y0, dy) = ygrid'.
+    If 'scan_yx' is true, the points are stored with y varying most
+    rapidly; otherwise x varies most rapidly.
+
+    """
+
+    (x0, dx) = xgrid
+    (y0, dy) = ygrid
+    if scan_yx:
+        spec = ['array=(%d,%d)' % (numy, numx,), 'scan=yx']
+    else:
+        spec = ['array=(%d,%d)' % (numx, numy,)]
+    spec.append('origin=(%r,%r)' % (x0, y0,))
+    spec.append('dx=%r dy=%r' % (dx, dy,))
+    if not dtype.isnative:
+        spec.append('endian=%s' % ({'<' : 'little', '>' : 'big'}[dtype.byteorder],))
+    spec.append('format="%s"' % (('%' + _binary_type(dtype)) * values,))
+    return string.join(spec)
+
+
+def _write_grid_text(f, data, xvals, yvals, missing=None, precision=None):
+    """Write grid data to 'f' as text 'x y f(x,y)' triplets.
+
+    The triplets are built and written for a few x values at a time,
+    in a buffer of about 'utils.chunk_values' values, so the memory
+    needed does not depend on the size of the grid.  The output is
+    the same as that of 'utils.write_array()' for the full (numx,
+    numy, 3) array of triplets.  NaN values are written as 'missing',
+    if it is not None, and 'precision' is as for 'utils.write_array()'.
+
+    """
+
+    xvals = utils.float_array(xvals)
+    yvals = utils.float_array(yvals)
+    (numx, numy) = data.shape
+
+    # output data to file as "x y f(x)" triplets, in blocks
+    # separated by blank lines so that gnuplot can connect the points
+    # into a grid.  Each block needs numy copies of an x value and
+    # one copy of each y value:
+    rows = max(utils.chunk_values // (3 * numy), 1)
+    dtype = numpy.array(
+        (xvals[:1], yvals[:1], utils.float_array(data[:1,0]))).dtype
+    set = numpy.zeros((min(rows, numx), numy, 3), dtype)
+    set[:,:,1] = yvals
+    for start in range(0, numx, rows):
+        stop = min(start + rows, numx)
+        block = set[:stop - start]
+        block[:,:,0] = xvals[start:stop,numpy.newaxis]
+        block[:,:,2] = utils.float_array(data[start:stop])
+        for subset in block:
+            utils.write_rows(f, subset, missing=missing, precision=precision)
+            f.write('\n')
+    f.write('\n')
+
+
+def GridData(
+    data, xvals=None, yvals=None, inline=_unset, filename=None,
+    dtype=None, mipmap=None, missing=None, **keyw
+    ):
+    """Return a _FileItem representing a function of two variables.
+
+    'GridData' represents a function that has been tabulated on a
+    rectangular grid.  The data are written to a file; no copy is kept
+    in memory.
+
+    Arguments:
+
+        'data' -- the data to plot: a 2-d array with dimensions
+            (numx,numy).
+
+        'xvals' -- a 1-d array with dimension 'numx'
+
+        'yvals' -- a 1-d array with dimension 'numy'
+
+        'binary=<bool>' -- send data to gnuplot in binary format?
+
+        'dtype=<numpy type>' -- the type of the values in binary
+            format: 'numpy.float32' or 'numpy.float64', which keeps
+            the full precision of double data but needs gnuplot 4.2
+            or later (see gp.GnuplotOpts.recognizes_general_binary).
+            If the grid is sent as an array (see below), integer
+            types are also allowed.  By default, the type of 'data'
+            (float or integer) is kept if the grid is sent as an
+            array and float32 is used otherwise.
+
+        'inline=<bool>' -- send data to gnuplot "inline"?
+
+        'filename=<string>' -- save data to a permanent file.
+
+        'mipmap=<string>' -- in 2-d plots (e.g., 'with image'), send
+            only as many cells as the plot has pixels across the
+            visible xrange, by combining blocks of cells using
+            'mean', 'max', or 'min'.  The reduced copies of the grid
+            are cached in the item (see 'decimation.Pyramid').  This
+            requires binary data on a uniform grid (see below).
+
+        'missing=<string>' -- in text format, write NaN values as
+            this string and tell gnuplot that it marks a missing value
+            (see 'Data').  The masked values of a 'numpy.ma' masked
+            array are turned into NaN.  ('missing="split"' is not
+            possible for grid data.)
+
+        'precision=<int>' -- in text format, the number of
+            significant digits to write (see 'Data').
+
+    Note the unusual argument order!  The data are specified *before*
+    the x and y values.  (This inconsistency was probably a mistake;
+    after all, the default xvals and yvals are not very useful.)
+
+    'data' must be a data array holding the values of a function
+    f(x,y) tabulated on a grid of points, such that 'data[i,j] ==
     f(xvals[i], yvals[j])'.  If 'xvals' and/or 'yvals' are omitted,
     integers (starting with 0) are used for that coordinate.  The data
-    are written to a temporary file; no copy of the data is kept in
-    memory.
+    are written to a temporary file when the item is first plotted.
 
     If 'binary=0' then the data are written to a datafile as 'x y
     f(x,y)' triplets (y changes most rapidly) that can be used by
     gnuplot's 'splot' command.  Blank lines are included each time the
     value of x changes so that gnuplot knows to plot a surface through
-    the data.
+    the data.  The triplets are formatted a few rows at a time as they
+    are written, so the memory needed does not grow with the size of
+    the grid (but inline or FIFO data are formatted again each time
+    the item is plotted).
 
     If 'binary=1' then the data are written to a file in a binary
     format that 'splot' can understand.  Binary format is faster and
@@ -646,7 +2649,20 @@ def GridData(
     recently-added feature), this behavior can be disabled by setting
     the configuration variable
     'gp.GnuplotOpts.recognizes_binary_splot=0' in the appropriate
-    gp*.py file.
+    gp*.py file.  Binary data are written directly from 'data' each
+    time they are needed, so 'data' should not be modified while the
+    item is in use.
+
+    If the grid is uniform (the x values, and likewise the y values,
+    are equally spaced), no filename is given, and gnuplot recognizes
+    general binary data, then the binary data are described to
+    gnuplot as an 'array' with the grid's origin and spacing and with
+    the axis order of 'data' in memory ('scan=yx' for a C-ordered
+    array).  A contiguous float array is then written straight from
+    its buffer, without any copy or conversion (the same goes for an
+    integer array, e.g. of 'uint8' or 'int16').  Otherwise the data
+    are written in gnuplot's (non-uniform) binary matrix format,
+    which requires a transposed copy, a block at a time.
 
     Thus if you have three arrays in the above format and a Gnuplot
     instance called g, you can plot your data by typing
@@ -654,8 +2670,9 @@ def GridData(
 
     """
 
-    # Try to interpret data as an array:
-    data = utils.float_array(data)
+    # Try to interpret data as an array (it is converted to floats
+    # when it is written):
+    data = numpy.asarray(utils.fill_masked(data))
     try:
         (numx, numy) = data.shape
     except ValueError:
@@ -664,7 +2681,7 @@ def GridData(
     if xvals is None:
         xvals = numpy.arange(numx)
     else:
-        xvals = utils.float_array(xvals)
+        xvals = numpy.asarray(xvals)
         if xvals.shape != (numx,):
             raise Errors.DataError(
                 'The size of xvals must be the same as the size of '
@@ -673,7 +2690,7 @@ def GridData(
     if yvals is None:
         yvals = numpy.arange(numy)
     else:
-        yvals = utils.float_array(yvals)
+        yvals = numpy.asarray(yvals)
         if yvals.shape != (numy,):
             raise Errors.DataError(
                 'The size of yvals must be the same as the size of '
@@ -684,69 +2701,192 @@ def GridData(
     binary = keyw.get('binary', 1) and gp.GnuplotOpts.recognizes_binary_splot
     keyw['binary'] = binary
 
-    if inline is _unset:
-        inline = (
-            (not binary) and (not filename)
-            and gp.GnuplotOpts.prefer_inline_data
-            )
-    elif inline and filename:
-        raise Errors.OptionError(
-            'cannot pass data both inline and via a file'
-            )
+    (inline, filename) = _output_options(inline, filename, binary)
+
+    if mipmap and mipmap not in decimation.reduce_methods:
+        raise Errors.OptionError('mipmap=%s' % (mipmap,))
+
+    if missing == 'split':
+        # A grid cannot be broken into lines like 'Data' can:
+        raise Errors.OptionError('missing=split is not possible with GridData')
+
+    precision = _get_precision(keyw)
 
     # xvals, yvals, and data are now all filled with arrays of data.
     if binary:
-        if inline:
-            raise Errors.OptionError('binary inline data not supported')
+        if missing is not None:
+            raise Errors.OptionError(
+                'missing=%s is not possible with binary data' % (missing,))
+
+        if dtype is not None:
+            dtype = numpy.dtype(dtype)
+            if not _is_binary(dtype):
+                raise Errors.OptionError('dtype=%s' % (dtype,))
+
+        xgrid = _grid_spacing(xvals)
+        ygrid = _grid_spacing(yvals)
+        if (not filename) and xgrid and ygrid \
+           and gp.GnuplotOpts.recognizes_general_binary:
+            if dtype is not None:
+                data = numpy.asarray(data, dtype)
+            elif not _is_binary(data.dtype):
+                data = data.astype(_binary_dtype(data.dtype))
+            if not data.flags.f_contiguous:
+                data = numpy.ascontiguousarray(data)
+            if mipmap:
+                content = _MipmapContent(data, mipmap, 0, xgrid, ygrid)
+                keyw['binary'] = content.get_binary_spec()
+            elif data.flags.c_contiguous:
+                keyw['binary'] = _binary_grid_spec(data, xgrid, ygrid)
+                content = _Content(utils.write_binary, data)
+            else:
+                keyw['binary'] = _binary_grid_spec(data, xgrid, ygrid)
+                # In Fortran order, the transpose is C-contiguous:
+                content = _Content(utils.write_binary, numpy.transpose(data))
+        elif mipmap:
+            raise Errors.OptionError(
+                'mipmap requires binary data on a uniform grid '
+                'and no filename')
+        else:
+            if dtype is None:
+                dtype = numpy.dtype(numpy.float32)
+            elif dtype == numpy.float64:
+                keyw['binary'] = 'matrix format="%float64"'
+            elif dtype != numpy.float32:
+                raise Errors.OptionError(
+                    'dtype=%s is not possible in binary matrix format'
+                    % (dtype,))
 
-        # write file in binary format
+            # write file in binary format (each time it is needed)
+            content = _Content(
+                _write_grid_binary, data, xvals, yvals, dtype)
+        return _make_file_item(content, keyw, 0, filename)
+    else:
+        # format the data as text (each time it is needed), streaming
+        # it a block at a time rather than keeping the text in memory:
+        content = _Content(
+            _write_grid_text, data, xvals, yvals, missing, precision)
+        item = _make_file_item(content, keyw, inline, filename)
+        item.missing = missing
+        return item
+
+
+def Image(data, origin=(0, 0), dx=1, dy=1, filename=None, mipmap=None,
+          **keyw):
+    """Return a _FileItem that plots a 2-d array as an image.
+
+    The array is sent to gnuplot in binary, as a general binary
+    'array' plotted 'with image' (gnuplot 4.2 or later; see
+    gp.GnuplotOpts.recognizes_general_binary), which is far smaller
+    and faster than sending 'x y z' triplets via 'GridData'.  A
+    contiguous array of a float or integer type (e.g., 'uint8' or
+    'uint16' camera data) is written straight from its buffer, with
+    no copy or conversion.
 
-        # It seems that the gnuplot documentation for binary mode
-        # disagrees with its actual behavior (as of v. 3.7).  The
-        # documentation has the roles of x and y exchanged.  We ignore
-        # the documentation and go with the code.
+    Arguments:
 
-        mout = numpy.zeros((numy + 1, numx + 1), numpy.float32)
-        mout[0,0] = numx
-        mout[0,1:] = xvals.astype(numpy.float32)
-        mout[1:,0] = yvals.astype(numpy.float32)
-        try:
-            # try copying without the additional copy implied by astype():
-            mout[1:,1:] = numpy.transpose(data)
-        except:
-            # if that didn't work then downcasting from double
-            # must be necessary:
-            mout[1:,1:] = numpy.transpose(data.astype(numpy.float32))
+        'data' -- a 2-d array with dimensions (height,width), such
+            that 'data[j,i]' is the pixel at 'x = x0 + i*dx' and 'y =
+            y0 + j*dy'.  It may be C- or Fortran-ordered.
 
-        content = mout.tostring()
-        if (not filename) and gp.GnuplotOpts.prefer_fifo_data:
-            return _FIFOFileItem(content, **keyw)
-        else:
-            return _NewFileItem(content, filename=filename, **keyw)
+        'origin=<tuple>' -- the coordinates '(x0,y0)' of the centre
+            of the pixel 'data[0,0]'.
+
+        'dx=<float>', 'dy=<float>' -- the size of a pixel.
+
+        'flipy=<bool>' -- if true, the rows are drawn from the top
+            down (as usual for images read from a file) rather than
+            from the bottom up.
+
+        'filename=<string>' -- save the raw array to a permanent file.
+
+        'mipmap=<string>' -- send only as many pixels as the plot has
+            across the visible xrange, combining blocks of pixels
+            using 'mean', 'max', or 'min'.  The reduced copies of the
+            image are cached in the item, so zooming in and out does
+            not recompute them (see 'decimation.Pyramid').
+
+    The data are written each time they are needed, so the array
+    should not be modified while the item is in use.  The default
+    'with_' option is 'image'.  The keyword arguments recognized by
+    '_FileItem' can also be used here.
+
+    """
+
+    data = numpy.asarray(data)
+    if len(data.shape) != 2:
+        raise Errors.DataError('image data must be two-dimensional')
+    return _image_item(
+        data, 1, 'image', origin, dx, dy, filename, mipmap, keyw)
+
+
+def RGBImage(data, origin=(0, 0), dx=1, dy=1, filename=None, mipmap=None,
+             **keyw):
+    """Return a _FileItem that plots an array of RGB(A) colours.
+
+    Like 'Image', except that 'data' is a 3-d array with dimensions
+    (height,width,3) holding red, green and blue values from 0 to 255
+    (plotted 'with rgbimage'), or (height,width,4) including an alpha
+    channel (plotted 'with rgbalpha').  A contiguous 'uint8' buffer,
+    as produced by most image libraries, is sent without any copy.
+
+    """
+
+    data = numpy.asarray(data)
+    if len(data.shape) != 3 or data.shape[2] not in (3, 4):
+        raise Errors.DataError(
+            'RGB image data must have dimensions (height,width,3) '
+            'or (height,width,4)')
+    if data.shape[2] == 3:
+        style = 'rgbimage'
     else:
-        # output data to file as "x y f(x)" triplets.  This
-        # requires numy copies of each x value and numx copies of
-        # each y value.  First reformat the data:
-        set = numpy.transpose(
-            numpy.array(
-                (numpy.transpose(numpy.resize(xvals, (numy, numx))),
-                 numpy.resize(yvals, (numx, numy)),
-                 data)), (1,2,0))
-
-        # Now output the data with the usual routine.  This will
-        # produce data properly formatted in blocks separated by blank
-        # lines so that gnuplot can connect the points into a grid.
-        f = StringIO()
-        utils.write_array(f, set)
-        content = f.getvalue()
-
-        if inline:
-            return _InlineFileItem(content, **keyw)
-        elif filename:
-            return _NewFileItem(content, filename=filename, **keyw)
-        elif gp.GnuplotOpts.prefer_fifo_data:
-            return _FIFOFileItem(content, **keyw)
-        else:
-            return _NewFileItem(content, **keyw)
+        style = 'rgbalpha'
+    return _image_item(data, data.shape[2], style, origin, dx, dy,
+                       filename, mipmap, keyw)
 
 
+def _image_item(data, values, style, origin, dx, dy, filename, mipmap, keyw):
+    """Create the _FileItem for 'Image' or 'RGBImage'."""
+
+    if not gp.GnuplotOpts.recognizes_general_binary:
+        raise Errors.OptionError(
+            'Gnuplot.py is currently configured to reject '
+            'general binary data')
+    inline = keyw.get('inline', _unset)
+    if 'inline' in keyw:
+        del keyw['inline']
+    (inline, filename) = _output_options(inline, filename, 1)
+    if not _is_binary(data.dtype):
+        data = data.astype(_binary_dtype(data.dtype))
+    if keyw.get('flipy'):
+        options = ' flipy'
+    else:
+        options = ''
+    if 'flipy' in keyw:
+        del keyw['flipy']
+
+    if mipmap:
+        if mipmap not in decimation.reduce_methods:
+            raise Errors.OptionError('mipmap=%s' % (mipmap,))
+        content = _MipmapContent(
+            data, mipmap, 1, (origin[0], dx), (origin[1], dy), values,
+            options)
+        keyw['binary'] = content.get_binary_spec()
+    else:
+        (height, width) = data.shape[:2]
+        if values == 1 and data.flags.f_contiguous \
+           and not data.flags.c_contiguous:
+            # Columns are contiguous, so y varies most rapidly:
+            scan_yx = 1
+            data = numpy.transpose(data)
+        else:
+            scan_yx = 0
+            data = numpy.ascontiguousarray(data)
+        keyw['binary'] = _binary_array_spec(
+            width, height, scan_yx, (origin[0], dx), (origin[1], dy),
+            data.dtype, values) + options
+        content = _Content(utils.write_binary, data)
+
+    if 'with_' not in keyw:
+        keyw['with_'] = style
+    return _make_file_item(content, keyw, 0, filename)
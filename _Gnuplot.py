@@ -12,7 +12,12 @@ interface to a running gnuplot process.
 
 """
 
-import sys, string, types
+import sys, string, types, time, Queue
+
+try:
+    import threading
+except ImportError:
+    import dummy_threading as threading
 
 import gp, PlotItems, termdefs, Errors
 
@@ -40,6 +45,8 @@ class _GnuplotFile:
 
         'flush' -- cause pending output to be written immediately.
 
+        'close' -- close the file.
+
     """
 
     def __init__(self, filename):
@@ -50,6 +57,17 @@ class _GnuplotFile:
         self.write = self.gnuplot.write
         self.flush = self.gnuplot.flush
 
+    def close(self):
+        if self.gnuplot is not None:
+            self.gnuplot.close()
+            self.gnuplot = None
+
+    def sync(self, timeout=None):
+        """Flush the file; there is nothing to wait for."""
+
+        self.flush()
+        return 0.0
+
     def __call__(self, s):
         """Write a command string to the file, followed by newline."""
 
@@ -57,6 +75,48 @@ class _GnuplotFile:
         self.flush()
 
 
+def _float_or_none(x):
+    if x is None:
+        return None
+    else:
+        return float(x)
+
+
+class _Batch:
+    """Buffer the commands sent to a 'Gnuplot' object; see 'batch()'.
+
+    The object is a context manager: on entry the 'Gnuplot' object is
+    put in buffered mode, and on exit its previous mode is restored
+    and, if it was not buffered, the commands are flushed.
+
+    """
+
+    def __init__(self, gnuplot):
+        self.gnuplot = gnuplot
+
+    def __enter__(self):
+        self.buffered = self.gnuplot.buffered
+        self.gnuplot.buffered = 1
+        return self.gnuplot
+
+    def __exit__(self, type, value, traceback):
+        self.gnuplot.buffered = self.buffered
+        if not self.buffered:
+            self.gnuplot.flush()
+
+
+# Commands that do not change any gnuplot setting (see 'Gnuplot.state'):
+_stateless_commands = [
+    'plot', 'splot', 'replot', 'print', 'pause', 'clear', 'show', 'save',
+    'help', 'test', 'pwd', 'refresh',
+    ]
+
+# Commands that can safely be given while a hardcopy terminal is still
+# selected; any other command might produce output, so the default
+# terminal is restored first (see 'Gnuplot.hardcopy_term'):
+_terminal_neutral_commands = ['set', 'unset', 'show']
+
+
 class Gnuplot:
     """Interface to a gnuplot program.
 
@@ -75,6 +135,35 @@ class Gnuplot:
         'plotcmd' -- 'plot' or 'splot', depending on what was the last
             plot command.
 
+        'resolution' -- the width of the plot in pixels (or None if
+            it is not known), as passed to the items' 'set_resolution'
+            method.  It is initialized from 'termdefs.get_resolution()'
+            for the default terminal and can be changed by the user.
+
+        'xrange' -- the numerical xrange last set via 'set_range' (a
+            tuple '(xmin, xmax)' whose elements may be None, with
+            'xmin <= xmax' even if the axis is reversed), or None if
+            unknown.  It is forgotten along with 'state'.
+
+        'buffered' -- if true, commands are not flushed to gnuplot
+            one by one but only by 'flush', 'refresh' (and the
+            methods that call it) and 'hardcopy'.
+
+        'state' -- a dictionary mapping the names of the settings
+            that have been made through the methods of this object
+            (e.g., 'xrange' or 'title') to the commands that made
+            them.  A method that would send the same command again
+            sends nothing.  The dictionary is emptied by 'reset' and
+            whenever a command passed to '__call__' might have
+            changed a setting behind its back.
+
+        'hardcopy_term' -- the 'set terminal' command of the last
+            hardcopy if the terminal has not been switched back to
+            the default terminal yet, otherwise None.  The switch is
+            only made before the next command other than 'set',
+            'unset' or 'show' (e.g., the next plot to the screen), so
+            that consecutive hardcopies set the terminal only once.
+
     Methods:
 
         '__init__' -- if a filename argument is specified, the
@@ -100,9 +189,18 @@ class Gnuplot:
         'refresh' -- issue (or reissue) the plot command using the
             current 'PlotItems'.
 
+        'append' -- append data to a 'LiveData' item and refresh.
+
         '__call__' -- pass an arbitrary string to the gnuplot process,
             followed by a newline.
 
+        'flush' -- send any buffered commands to gnuplot.
+
+        'sync' -- wait until gnuplot has executed the commands sent.
+
+        'batch' -- return a context manager that buffers commands
+            until the end of a 'with' block.
+
         'xlabel', 'ylabel', 'zlabel', 'title' -- set corresponding plot
             attribute.
 
@@ -151,7 +249,7 @@ class Gnuplot:
         'output' : 'string',
         }
 
-    def __init__(self, filename=None, persist=None, debug=0):
+    def __init__(self, filename=None, persist=None, debug=0, buffered=0):
         """Create a Gnuplot object.
 
         Create a 'Gnuplot' object.  By default, this starts a gnuplot
@@ -171,6 +269,9 @@ class Gnuplot:
           'debug=1' -- echo the gnuplot commands to stderr as well as
               sending them to gnuplot.
 
+          'buffered=1' -- do not flush each command to gnuplot as it
+              is issued (see 'batch').
+
         """
 
         if filename is None:
@@ -183,8 +284,13 @@ class Gnuplot:
             self.gnuplot = _GnuplotFile(filename)
         self._clear_queue()
         self.debug = debug
+        self.buffered = buffered
         self.plotcmd = 'plot'
-        self('set terminal %s' % (gp.GnuplotOpts.default_term,))
+        self.resolution = termdefs.get_resolution(gp.GnuplotOpts.default_term)
+        self.xrange = None
+        self.state = {}
+        self.hardcopy_term = None
+        self._send('set terminal %s' % (gp.GnuplotOpts.default_term,))
 
     def close(self):
         # This may cause a wait for the gnuplot process to finish
@@ -203,27 +309,169 @@ class Gnuplot:
 
         Send the string s as a command to gnuplot, followed by a
         newline.  All communication with the gnuplot process (except
-        for inline data) is through this method.
+        for inline data) is through this method or '_send'.  In
+        buffered mode the
+        command is not flushed.
+
+        Since the command may change gnuplot's settings, the entries
+        of 'state' that it might affect are forgotten (see
+        '_forget_state'), and unless it is a 'set', 'unset' or 'show'
+        command, the terminal is first switched back from the last
+        hardcopy terminal.
 
         """
 
-        self.gnuplot(s)
+        self._forget_state(s)
+        self._send(s)
+
+    def _send(self, s):
+        """Send a command string to gnuplot without checking it."""
+
+        if self.buffered:
+            self.gnuplot.write(s + '\n')
+        else:
+            self.gnuplot(s)
         if self.debug:
             # also echo to stderr for user to see:
             sys.stderr.write('gnuplot> %s\n' % (s,))
 
+    def _forget_state(self, s):
+        """Forget the settings in 'state' that command 's' might change.
+
+        Commands that only plot or print are harmless.  'set output'
+        and 'set terminal' forget only the output and the pending
+        hardcopy terminal, and 'reset' (which does not touch either
+        of those) and all other commands forget all of 'state' and
+        the numerical 'xrange'.
+
+        """
+
+        for cmd in string.split(s, ';'):
+            words = string.split(cmd)
+            if not words:
+                continue
+            verb = words[0]
+            if verb not in _terminal_neutral_commands:
+                self._restore_terminal()
+            if verb in _stateless_commands:
+                pass
+            elif verb == 'set' and len(words) > 1 \
+                 and words[1] == 'output'[:len(words[1])]:
+                if 'output' in self.state:
+                    del self.state['output']
+            elif verb == 'set' and len(words) > 1 \
+                 and words[1] == 'terminal'[:len(words[1])]:
+                self.hardcopy_term = None
+            else:
+                self.state.clear()
+                self.xrange = None
+
+    def _set(self, key, cmd):
+        """Send 'cmd', which sets 'key', unless it is already in effect."""
+
+        if self.state.get(key) != cmd:
+            self._send(cmd)
+            self.state[key] = cmd
+
+    def _restore_terminal(self):
+        """Switch back to the default terminal after a hardcopy."""
+
+        if self.hardcopy_term is not None:
+            self._send('set terminal %s' % (gp.GnuplotOpts.default_term,))
+            self.hardcopy_term = None
+
+    def flush(self):
+        """Send any buffered commands and data to gnuplot."""
+
+        self.gnuplot.flush()
+
+    def sync(self, timeout=None):
+        """Wait until gnuplot has executed all of the commands sent.
+
+        Any buffered commands are flushed first.  Return the time
+        waited, in seconds; this is also a measure of how long gnuplot
+        takes to draw a plot.  After 'sync()' returns, a hardcopy is
+        complete and temporary files can safely be deleted.  Raise
+        'Errors.TimeoutError' if gnuplot has not caught up after
+        'timeout' seconds.  See 'gp_unix.GnuplotProcess.sync()'; the
+        method is not available on every platform.
+
+        """
+
+        if not hasattr(self.gnuplot, 'sync'):
+            raise Errors.Error('sync() is not supported on this platform')
+        self.flush()
+        return self.gnuplot.sync(timeout)
+
+    def batch(self):
+        """Return a context manager that buffers the commands in a block.
+
+        Commands and inline data sent within the block are collected
+        in the pipe's buffer and flushed to gnuplot once, at the end
+        of the block (or earlier, by 'refresh' or 'hardcopy'), rather
+        than one command at a time.  Batches can be nested.  For
+        example::
+
+            with g.batch():
+                g.title('Title')
+                g.xlabel('x')
+                g('set grid')
+                g.plot(d)
+
+        (Python 2.5 needs 'from __future__ import with_statement'.)
+
+        """
+
+        return _Batch(self)
+
     def refresh(self):
         """Refresh the plot, using the current 'PlotItem's.
 
         Refresh the current plot by reissuing the gnuplot plot command
         corresponding to the current itemlist.
 
+        Before the plot command is built, each item is told the
+        resolution of the plot (see 'PlotItem.set_resolution'), so
+        that items like 'Data(..., decimate="auto")' can send only as
+        many points as will be visible.  This is only done for 2-d
+        plots.  The commands and data are flushed to gnuplot at the
+        end, even in buffered mode.  If the last hardcopy left another
+        terminal selected, the default terminal is selected first.
+
         """
 
+        self._restore_terminal()
+        self._draw()
+
+    def _draw(self):
+        """Issue the plot command on the current terminal."""
+
+        if self.plotcmd == 'plot':
+            (resolution, xrange) = (self.resolution, self.xrange)
+        else:
+            (resolution, xrange) = (None, None)
+        for item in self.itemlist:
+            item.set_resolution(resolution, xrange)
+        # The marker for missing values applies to the whole plot, so
+        # one set here must be unset again when no item asks for one
+        # (but a marker set by the user is left alone):
+        missing = None
+        for item in self.itemlist:
+            if getattr(item, 'missing', None) is not None:
+                missing = item.missing
+        if missing is None:
+            if 'datafile missing' in self.state:
+                self._set('datafile missing', 'unset datafile missing')
+        else:
+            self._set('datafile missing', 'set datafile missing %s'
+                      % (gp.double_quote_string(missing),))
+        for item in self.itemlist:
+            # Datablocks etc. that must precede the plot command:
+            item.define(self.gnuplot)
         plotcmds = []
         for item in self.itemlist:
             plotcmds.append(item.command())
-        self(self.plotcmd + ' ' + string.join(plotcmds, ', '))
+        self._send(self.plotcmd + ' ' + string.join(plotcmds, ', '))
         for item in self.itemlist:
             # Uses self.gnuplot.write():
             item.pipein(self.gnuplot)
@@ -332,6 +580,17 @@ class Gnuplot:
         self._add_to_queue(items)
         self.refresh()
 
+    def append(self, item, *data):
+        """Append data to a 'LiveData' item, then refresh the plot.
+
+        Only the new data are written (see 'PlotItems.LiveData').  The
+        item would normally be part of the current plot.
+
+        """
+
+        item.append(*data)
+        self.refresh()
+
     def interact(self):
         """Allow user to type arbitrary commands to gnuplot.
 
@@ -341,6 +600,7 @@ class Gnuplot:
         """
 
         import time
+        self._restore_terminal()
         if sys.platform == 'win32':
             sys.stderr.write('Press Ctrl-z twice to end interactive input\n')
         else:
@@ -352,6 +612,7 @@ class Gnuplot:
             except EOFError:
                 break
             self(line)
+            self.flush()
             time.sleep(0.2) # give a little time for errors to be written
         sys.stderr.write('\n')
 
@@ -361,10 +622,15 @@ class Gnuplot:
         self('clear')
 
     def reset(self):
-        """Reset all gnuplot settings to their defaults and clear itemlist."""
+        """Reset all gnuplot settings to their defaults and clear itemlist.
+
+        The record of the settings made (see 'state') is emptied too.
+
+        """
 
         self('reset')
         self.itemlist = []
+        self.xrange = None
 
     def load(self, filename):
         """Load a file using gnuplot's 'load' command."""
@@ -380,9 +646,9 @@ class Gnuplot:
         """Set a string option, or if s is omitted, unset the option."""
 
         if s is None:
-            self('set %s' % (option,))
+            self._set(option, 'set %s' % (option,))
         else:
-            self('set %s "%s"' % (option, s))
+            self._set(option, 'set %s "%s"' % (option, s))
 
     def set_label(self, option, s=None, offset=None, font=None):
         """Set or clear a label option, which can include an offset or font.
@@ -407,7 +673,7 @@ class Gnuplot:
             if font is not None:
                 cmd.append('"%s"' % (font,))
 
-        self(string.join(cmd))
+        self._set(option, string.join(cmd))
 
     def set_boolean(self, option, value):
         """Set an on/off option.  It is assumed that the way to turn
@@ -415,9 +681,9 @@ class Gnuplot:
         `set no<option>'."""
 
         if value:
-            self('set %s' % option)
+            self._set(option, 'set %s' % option)
         else:
-            self('set no%s' % option)
+            self._set(option, 'set no%s' % option)
 
     def set_range(self, option, value):
         """Set a range option (xrange, yrange, trange, urange, etc.).
@@ -427,30 +693,47 @@ class Gnuplot:
         then that range is passed as `*' (which means to
         autoscale)."""
 
+        if option == 'xrange':
+            # Remember numerical xranges for 'set_resolution':
+            self.xrange = None
         if value is None:
-            self('set %s [*:*]' % (option,))
+            self._set(option, 'set %s [*:*]' % (option,))
         elif type(value) is types.StringType:
-            self('set %s %s' % (option, value,))
+            self._set(option, 'set %s %s' % (option, value,))
         else:
             # Must be a tuple:
             (minrange,maxrange) = value
+            if option == 'xrange':
+                try:
+                    self.xrange = tuple(map(_float_or_none, value))
+                except (TypeError, ValueError):
+                    pass
+                else:
+                    if None not in self.xrange:
+                        # gnuplot also accepts a reversed range:
+                        self.xrange = (min(self.xrange), max(self.xrange))
             if minrange is None:
                 minrange = '*'
             if maxrange is None:
                 maxrange = '*'
-            self('set %s [%s:%s]' % (option, minrange, maxrange,))
+            self._set(option, 'set %s [%s:%s]' % (option, minrange, maxrange,))
 
     def set(self, **keyw):
         """Set one or more settings at once from keyword arguments.
         The allowed settings and their treatments are determined from
-        the optiontypes mapping."""
+        the optiontypes mapping.  The commands are flushed together."""
 
-        for (k,v) in keyw.items():
-            try:
-                type = self.optiontypes[k]
-            except KeyError:
-                raise 'option %s is not supported' % (k,)
-            getattr(self, 'set_%s' % type)(k, v)
+        batch = _Batch(self)
+        batch.__enter__()
+        try:
+            for (k,v) in keyw.items():
+                try:
+                    type = self.optiontypes[k]
+                except KeyError:
+                    raise 'option %s is not supported' % (k,)
+                getattr(self, 'set_%s' % type)(k, v)
+        finally:
+            batch.__exit__(None, None, None)
 
     def xlabel(self, s=None, offset=None, font=None):
         """Set the plot's xlabel."""
@@ -486,6 +769,12 @@ class Gnuplot:
         their defaults by setting mode='default'.  I consider this to
         be a bug in gnuplot.
 
+        The hardcopy terminal stays selected until the next plot to
+        the screen (see 'hardcopy_term'), and the 'set terminal'
+        command is not repeated for a following hardcopy with the same
+        terminal options.  The output file is closed (by 'set output')
+        at the end of each hardcopy.
+
         Keyword arguments:
 
           'filename=<string>' -- if a filename is specified, save the
@@ -534,10 +823,18 @@ class Gnuplot:
           'fontsize=<double>' -- set the default font size, in
               postscript points.
 
+        Keyword arguments for 'png' terminal (among others):
+
+          'size=<string>' -- set the size of the image in pixels,
+              e.g., '800,600'.  The width is also used to decide how
+              many points of 'Data(..., decimate="auto")' items to
+              send (see 'termdefs.get_resolution()').
+
         Note that this command will return immediately even though it
-        might take gnuplot a while to actually finish working.  Be
-        sure to pause briefly before issuing another command that
-        might cause the temporary files to be deleted.
+        might take gnuplot a while to actually finish working.  Call
+        'sync()' (or pause briefly, if that is not supported) before
+        issuing another command that might cause the temporary files
+        to be deleted.
 
         """
 
@@ -555,6 +852,9 @@ class Gnuplot:
         # exception is postscript's 'enhanced' option, which is just
         # too useful to have to specify each time!
 
+        # This has to be worked out before the options are consumed:
+        resolution = termdefs.get_resolution(terminal, keyw)
+
         # Build up the 'set terminal' command here:
         setterm = ['set', 'terminal', terminal]
         try:
@@ -575,11 +875,274 @@ class Gnuplot:
                 )
 
         self.set_string('output', filename)
-        self(string.join(setterm))
-        # replot the current figure (to the printer):
-        self.refresh()
-        # reset the terminal to its `default' setting:
-        self('set terminal %s' % gp.GnuplotOpts.default_term)
+        setterm = string.join(setterm)
+        if setterm != self.hardcopy_term:
+            self._send(setterm)
+            self.hardcopy_term = setterm
+        # replot the current figure (to the printer), at the
+        # resolution of the hardcopy:
+        (resolution, self.resolution) = (self.resolution, resolution)
+        try:
+            self._draw()
+        finally:
+            self.resolution = resolution
+        # Close the output file.  The terminal is reset to its
+        # `default' setting only before the next plot to the screen:
         self.set_string('output')
+        self.flush()
+
+
+class Refresher(threading.Thread):
+    """Redraw a plot at a fixed rate, but only when its data change.
+
+    A 'Refresher' is a background thread that wakes up 'rate' times
+    per second and calls the 'refresh()' method of a 'Gnuplot' object
+    if any of the items in its current plot have changed since the
+    last redraw.  An item signals a change by incrementing its
+    'version' member (see 'PlotItems.RollingData'); items without a
+    'version' never trigger a redraw, but starting a new plot does.
+    Thus any number of updates between two frames are coalesced into
+    a single redraw, and an idle plot costs nothing.
+
+    A 'Gnuplot' object is not itself thread-safe.  While a Refresher
+    is running, other threads that want to send commands to the same
+    'Gnuplot' object should hold 'refresher.lock' while doing so.
+    Call 'stop()' to end the thread.
+
+    Members:
+
+        'gnuplot' -- the 'Gnuplot' object being refreshed.
+
+        'interval' -- the time between frames, in seconds.
+
+        'lock' -- held while the plot is being refreshed.
+
+        'frames' -- the number of redraws done so far.
+
+    """
+
+    def __init__(self, gnuplot, rate=10.0):
+        threading.Thread.__init__(
+            self, name=('Refresher for %s' % (gnuplot,)))
+        self.setDaemon(1)
+        self.gnuplot = gnuplot
+        self.interval = 1.0 / rate
+        self.lock = threading.RLock()
+        self.frames = 0
+        self.stopped = threading.Event()
+        # The plot is assumed to be up to date when we start:
+        self.drawn = self.get_state()
+        self.start()
+
+    def get_state(self):
+        """Return a value that changes whenever the plot needs redrawing."""
+
+        return [
+            (id(item), getattr(item, 'version', None))
+            for item in self.gnuplot.itemlist
+            ]
+
+    def run(self):
+        next = time.time()
+        while not self.stopped.isSet():
+            next = max(next + self.interval, time.time())
+            self.stopped.wait(next - time.time())
+            if self.stopped.isSet():
+                break
+            state = self.get_state()
+            if state != self.drawn:
+                self.lock.acquire()
+                try:
+                    self.gnuplot.refresh()
+                finally:
+                    self.lock.release()
+                self.drawn = state
+                self.frames += 1
+
+    def stop(self):
+        """Stop refreshing and wait for the thread to finish."""
+
+        self.stopped.set()
+        if threading.currentThread() is not self:
+            self.join()
+
+
+class Request:
+    """A command queued by an 'AsyncGnuplot', and later its result.
+
+    A 'Request' is like a future: it is returned at once by the
+    methods of 'AsyncGnuplot', and is completed when the worker thread
+    has carried out the command.
+
+    Members:
+
+        'method' -- the name of the 'Gnuplot' method to call.
+
+        'args', 'keyw' -- the arguments for the method.
+
+    """
+
+    def __init__(self, method, args, keyw):
+        self.method = method
+        self.args = args
+        self.keyw = keyw
+        self.result = None
+        self.exc_info = None
+        self.callbacks = []
+        self.finished = threading.Event()
+        self.lock = threading.Lock()
+
+    def done(self):
+        """Return true if the command has been carried out."""
+
+        return self.finished.isSet()
+
+    def wait(self, timeout=None):
+        """Wait for the command to be carried out and return its result.
+
+        If the command raised an exception, it is raised again here.
+        Raise 'Errors.TimeoutError' if the command has not been
+        carried out after 'timeout' seconds.
+
+        """
+
+        self.finished.wait(timeout)
+        if not self.finished.isSet():
+            raise Errors.TimeoutError(
+                '%s() did not finish within %s seconds'
+                % (self.method, timeout,))
+        if self.exc_info is not None:
+            raise self.exc_info[0], self.exc_info[1], self.exc_info[2]
+        return self.result
+
+    def add_callback(self, callback):
+        """Call 'callback(request)' when the command has been carried out.
 
+        The callback is called in the worker thread, or at once if the
+        command has already been carried out.
+
+        """
+
+        self.lock.acquire()
+        try:
+            if not self.finished.isSet():
+                self.callbacks.append(callback)
+                return
+        finally:
+            self.lock.release()
+        callback(self)
+
+    def run(self, gnuplot):
+        """Carry out the command on 'gnuplot' (in the worker thread)."""
+
+        try:
+            self.result = getattr(gnuplot, self.method)(
+                *self.args, **self.keyw)
+        except:
+            self.exc_info = sys.exc_info()
+        self.lock.acquire()
+        try:
+            self.finished.set()
+            callbacks = self.callbacks
+            self.callbacks = []
+        finally:
+            self.lock.release()
+        for callback in callbacks:
+            callback(self)
+
+
+class AsyncGnuplot(threading.Thread):
+    """A 'Gnuplot' object driven by a worker thread.
+
+    The methods 'plot', 'splot', 'replot', 'hardcopy', 'sync' and
+    '__call__' of an 'AsyncGnuplot' do not block: they queue the
+    command and return a 'Request' at once.  A worker thread carries
+    out the commands in order on its own 'Gnuplot' object, so the time
+    spent writing data to gnuplot (and waiting for it in 'sync') is
+    not spent in the calling thread, and one thread can drive many
+    gnuplot processes at the same time.  For example::
+
+        gs = [Gnuplot.AsyncGnuplot() for i in range(20)]
+        requests = []
+        for (i, g) in enumerate(gs):
+            g.plot(Gnuplot.Data(data[i]))
+            g.hardcopy('plot%d.png' % (i,), terminal='png')
+            requests.append(g.sync())
+        for request in requests:
+            request.wait()          # all of the files are complete
+
+    The result of a request is available from 'request.wait()',
+    which also reraises any exception raised by the command; see
+    'Request'.  The 'Gnuplot' object should not be used directly while
+    the thread is running.  Call 'close()' to finish the queued
+    commands and end the thread.
+
+    Members:
+
+        'gnuplot' -- the 'Gnuplot' object, which is created with the
+            arguments of the constructor.
+
+        'queue' -- the queue of pending 'Request's.
+
+    """
+
+    def __init__(self, *args, **keyw):
+        self.gnuplot = Gnuplot(*args, **keyw)
+        threading.Thread.__init__(
+            self, name=('AsyncGnuplot for %s' % (self.gnuplot,)))
+        self.setDaemon(1)
+        self.queue = Queue.Queue()
+        self.start()
+
+    def run(self):
+        while 1:
+            request = self.queue.get()
+            if request is None:
+                break
+            request.run(self.gnuplot)
+
+    def submit(self, method, *args, **keyw):
+        """Queue a call of the 'Gnuplot' method 'method'; return a Request."""
+
+        request = Request(method, args, keyw)
+        self.queue.put(request)
+        return request
+
+    def __call__(self, s):
+        """Queue a command string for gnuplot."""
+
+        return self.submit('__call__', s)
+
+    def plot(self, *items, **keyw):
+        """Queue a 'plot'; see 'Gnuplot.plot'."""
+
+        return self.submit('plot', *items, **keyw)
+
+    def splot(self, *items, **keyw):
+        """Queue a 'splot'; see 'Gnuplot.splot'."""
+
+        return self.submit('splot', *items, **keyw)
+
+    def replot(self, *items, **keyw):
+        """Queue a 'replot'; see 'Gnuplot.replot'."""
+
+        return self.submit('replot', *items, **keyw)
+
+    def hardcopy(self, filename=None, terminal='postscript', **keyw):
+        """Queue a 'hardcopy'; see 'Gnuplot.hardcopy'."""
+
+        return self.submit('hardcopy', filename, terminal, **keyw)
+
+    def sync(self, timeout=None):
+        """Queue a 'sync'; the request's result is the time gnuplot took."""
+
+        return self.submit('sync', timeout)
+
+    def close(self):
+        """Carry out the queued commands, end the thread and close gnuplot."""
 
+        if self.isAlive():
+            self.queue.put(None)
+            if threading.currentThread() is not self:
+                self.join()
+        self.gnuplot.close()
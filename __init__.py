@@ -84,17 +84,40 @@ Features:
     Builtin PlotItem types:
 
     * 'Data(array1)' -- data from a Python list or NumPy array
-                        (permits additional option 'cols' )
+                        (permits additional options 'cols',
+                        'decimate' and 'missing' )
+
+    * 'StreamData(iterable)' -- data produced chunk by chunk, e.g., by
+                                a generator
+
+    * 'TimeSeries(x, y)' -- a very long series, indexed so that only
+                            the visible part is sent, at screen
+                            resolution
+
+    * 'Datablock(array1)' -- like 'Data', but sent to gnuplot only once
+                             and replotted by name
+
+    * 'LiveData(array1)' -- data that can be extended incrementally
+                            with 'append()'
+
+    * 'RollingData(size)' -- a ring buffer of the last 'size' points,
+                             typically redrawn by a 'Refresher'
 
     * 'File('filename')' -- data from an existing data file (permits
                             additional option 'using' )
 
+    * 'NpyFile('filename.npy')' -- an array saved by 'numpy.save()',
+                                   read directly by gnuplot
+
     * 'Func('exp(4.0 * sin(x))')' -- functions (passed as a string,
                                      evaluated by gnuplot)
 
     * 'GridData(m, x, y)' -- data tabulated on a grid of (x,y) values
                              (usually to be plotted in 3-D)
 
+    * 'Image(m)', 'RGBImage(m)' -- a 2-d array (or an array of RGB(A)
+                                   colours) plotted as an image
+
     See the documentation strings for those classes for more details.
 
  o  PlotItems are implemented as objects that can be assigned to
@@ -112,6 +135,10 @@ Features:
 
  o  Can use 'replot' method to add datasets to an existing plot.
 
+ o  An 'AsyncGnuplot' object queues its commands for a worker thread
+    and returns at once, so that one program can drive many gnuplot
+    processes concurrently.
+
  o  Can make persistent gnuplot windows by using the constructor option
     'persist=1'.  Such windows stay around even after the gnuplot
     program is exited.  Note that only newer version of gnuplot support
@@ -123,6 +150,11 @@ Features:
  o  Grid data for the splot command can be sent to gnuplot in binary
     format, saving time and disk space.
 
+ o  Missing values in array data (NaN, or the masked values of a
+    'numpy.ma' masked array) are passed on to gnuplot as undefined
+    points, as a 'set datafile missing' marker, or as breaks in the
+    data (see the 'missing' option of 'Data').
+
  o  Should work under Unix, Macintosh, and Windows.
 
 Restrictions:
@@ -139,9 +171,6 @@ Restrictions:
         g('set data style linespoints')
         g('set pointsize 5')
 
- -  There is no provision for missing data points in array data (which
-    gnuplot allows via the 'set missing' command).
-
 Bugs:
 
  -  No attempt is made to check for errors reported by gnuplot.  On
@@ -158,11 +187,13 @@ Bugs:
 __version__ = '1.8+'
 
 # Other modules that should be loaded for 'from Gnuplot import *':
-__all__ = ['utils', 'funcutils', ]
+__all__ = ['utils', 'funcutils', 'decimation', ]
 
 from gp import GnuplotOpts, GnuplotProcess, test_persist
-from Errors import Error, OptionError, DataError
-from PlotItems import PlotItem, Func, File, Data, GridData
-from _Gnuplot import Gnuplot
+from Errors import Error, OptionError, DataError, TimeoutError
+from PlotItems import PlotItem, Func, File, NpyFile, Data, StreamData, \
+     TimeSeries, Datablock, LiveData, RollingData, GridData, Image, \
+     RGBImage
+from _Gnuplot import Gnuplot, Refresher, AsyncGnuplot, Request
 
 
@@ -0,0 +1,109 @@
+#! /usr/bin/env python
+
+# $Id$
+
+# This file is licensed under the GNU Lesser General Public License
+# (LGPL).  See LICENSE.txt for details.
+
+"""benchmark.py -- Time the data-transfer routines of Gnuplot.py.
+
+This program doesn't need gnuplot; it only measures how quickly data
+can be turned into the text that is sent to gnuplot.  Run it by typing
+'python benchmark.py'.
+
+"""
+
+import string, time
+
+try:
+    from cStringIO import StringIO
+except ImportError:
+    from StringIO import StringIO
+
+import numpy
+
+try:
+    import Gnuplot.utils
+    utils = Gnuplot.utils
+except ImportError:
+    # kludge in case Gnuplot hasn't been installed as a module yet:
+    import utils
+
+
+def write_array_rowwise(f, set, item_sep=' ', nest_suffix='\n'):
+    """The row-at-a-time writer used by Gnuplot.py up to version 1.8.
+
+    Only the 2-d case with default nesting is reproduced here, as a
+    reference for the timings.
+
+    """
+
+    (points, columns) = set.shape
+    fmt = string.join(['%s'] * columns, item_sep)
+    for point in set:
+        f.write(fmt % tuple(point.tolist()))
+        f.write(nest_suffix)
+    f.write(nest_suffix)
+
+
+def timeit(func, *args):
+    """Return (seconds, output) for one call of func(f, *args)."""
+
+    f = StringIO()
+    start = time.time()
+    func(f, *args)
+    return (time.time() - start, f.getvalue())
+
+
+def bench_write_array(points, columns=2):
+    data = numpy.random.random((points, columns))
+
+    (t_old, old) = timeit(write_array_rowwise, data)
+    (t_new, new) = timeit(utils.write_array, data)
+    assert new == old, 'write_array output differs from the reference'
+    print '%9d x %d  %8.3fs  %8.3fs  %6.1fx  %8.1f MB/s' % (
+        points, columns, t_old, t_new, t_old / max(t_new, 1e-9),
+        len(new) / max(t_new, 1e-9) / 1e6,
+        )
+
+
+def write_array_precision(f, set, precision):
+    utils.write_array(f, set, precision=precision)
+
+
+def bench_precision(points, columns=2):
+    """Compare the time and the amount of text for various precisions."""
+
+    data = numpy.random.random((points, columns))
+
+    # The full-precision output is the baseline for the others:
+    (t_full, full) = timeit(write_array_precision, data, None)
+    print '%9d x %d  %9s  %8.3fs  %10d  %6.1f%%' % (
+        points, columns, None, t_full, len(full), 100.,
+        )
+    for precision in [8, 6, 4]:
+        (t, out) = timeit(write_array_precision, data, precision)
+        print '%9d x %d  %9s  %8.3fs  %10d  %6.1f%%' % (
+            points, columns, precision, t, len(out),
+            100. * len(out) / len(full),
+            )
+
+
+def main():
+    print '############### write_array (text) ##########################'
+    print '%13s  %9s  %9s  %7s  %13s' % (
+        'shape', 'rowwise', 'chunked', 'speedup', 'throughput')
+    for points in [1000, 100000, 1000000]:
+        bench_write_array(points, 2)
+    bench_write_array(100000, 5)
+
+    print '############### write_array(precision=...) ##################'
+    print '%13s  %9s  %9s  %10s  %7s' % (
+        'shape', 'precision', 'time', 'bytes', 'size')
+    bench_precision(1000000, 2)
+
+
+# when executed, just run main():
+if __name__ == '__main__':
+    main()
+
@@ -0,0 +1,401 @@
+# $Id$
+
+# This file is licensed under the GNU Lesser General Public License
+# (LGPL).  See LICENSE.txt for details.
+
+"""decimation.py -- Reduce the number of points in a data series.
+
+Plotting more points than the output device has pixels only costs
+time.  The functions in this module select a subset of the rows of a
+2-d array of data points (one point per row, with x and y values in
+two of the columns) that looks the same when plotted at a given
+resolution.  They are used by 'Data(..., decimate=<n>)' but can also
+be called directly.
+
+All of the functions keep the first and last points and return rows
+of the original array in their original order.  The x values are
+assumed to be sorted (e.g., a time series).
+
+For gridded data (images and heatmaps), 'block_reduce()' halves the
+resolution of an array by combining 2x2 blocks of cells, and
+'Pyramid' keeps a cache of successively reduced copies (a 'mip
+pyramid').  These are used by 'Image(..., mipmap=<method>)' and
+'GridData(..., mipmap=<method>)'.
+
+"""
+
+import numpy
+
+
+def _bucket_edges(start, stop, buckets):
+    """Return the boundaries of 'buckets' nearly equal index ranges.
+
+    The ranges cover the indices 'start' to 'stop', and the return
+    value is an integer array 'e' such that bucket 'i' is 'e[i]:e[i+1]'.
+
+    """
+
+    return start + (numpy.arange(buckets + 1) * (stop - start)) // buckets
+
+
+def minmax(data, n, ycol=1):
+    """Select at most about 'n' points, keeping each bucket's extremes.
+
+    The points (apart from the first and last) are divided into n/2
+    buckets of consecutive points, and the points with the smallest
+    and largest y value in each bucket are kept.  Drawn with lines,
+    the result covers exactly the same vertical extent at every
+    bucket as the full data, so no spike is ever lost.  The work is
+    done entirely with array operations.
+
+    """
+
+    points = len(data)
+    if points <= max(n, 2):
+        return data
+
+    buckets = max((n - 2) // 2, 1)
+    size = -(-(points - 2) // buckets)
+    y = data[1:-1, ycol]
+    pad = buckets * size - len(y)
+
+    # Pad the y values to a (buckets, size) matrix, using values that
+    # are never selected as minimum or maximum:
+    lo = numpy.concatenate((y, numpy.zeros(pad, y.dtype) + numpy.inf))
+    hi = numpy.concatenate((y, numpy.zeros(pad, y.dtype) - numpy.inf))
+    offsets = numpy.arange(buckets) * size + 1
+    imin = numpy.reshape(lo, (buckets, size)).argmin(1) + offsets
+    imax = numpy.reshape(hi, (buckets, size)).argmax(1) + offsets
+
+    # If the number of points does not divide evenly, the last
+    # buckets may be entirely padding:
+    keep = numpy.concatenate(([0], imin, imax, [points - 1]))
+    keep = numpy.unique(numpy.minimum(keep, points - 1))
+    return data[keep]
+
+
+def lttb(data, n, xcol=0, ycol=1):
+    """Select 'n' points using the largest-triangle-three-buckets method.
+
+    The points (apart from the first and last) are divided into n-2
+    buckets.  From each bucket, the point is kept that forms the
+    largest triangle with the point kept from the previous bucket and
+    the average of the points in the next bucket.  This preserves the
+    visual shape of a series better than plain subsampling and tends
+    to keep its peaks.
+
+    (Sveinn Steinarsson, "Downsampling Time Series for Visual
+    Representation", 2013.)  The loop runs over the buckets, i.e. over
+    the output points; the work within each bucket is done with array
+    operations.
+
+    """
+
+    points = len(data)
+    if points <= max(n, 2) or n < 3:
+        return data
+
+    x = numpy.asarray(data[:, xcol], numpy.float64)
+    y = numpy.asarray(data[:, ycol], numpy.float64)
+    edges = _bucket_edges(1, points - 1, n - 2)
+
+    # The average of each bucket (plus the last point, which serves as
+    # the "next bucket" of the last bucket):
+    counts = edges[1:] - edges[:-1]
+    xavg = numpy.add.reduceat(x[:-1], edges[:-1]) / counts
+    yavg = numpy.add.reduceat(y[:-1], edges[:-1]) / counts
+    xavg = numpy.concatenate((xavg[1:], x[-1:]))
+    yavg = numpy.concatenate((yavg[1:], y[-1:]))
+
+    keep = numpy.zeros(n, numpy.int_)
+    keep[-1] = points - 1
+    a = 0
+    for i in range(n - 2):
+        (start, stop) = (edges[i], edges[i + 1])
+        # Twice the area of the triangles (a, j, average of next bucket):
+        area = numpy.absolute(
+            (x[a] - xavg[i]) * (y[start:stop] - y[a])
+            - (x[a] - x[start:stop]) * (yavg[i] - y[a])
+            )
+        a = start + area.argmax()
+        keep[i + 1] = a
+    return data[keep]
+
+
+methods = {
+    'minmax' : minmax,
+    'lttb' : lttb,
+    }
+
+
+def decimate(data, n, method='minmax'):
+    """Reduce the rows of 'data' to about 'n' using the named method.
+
+    'data' is a 2-d array with x values in column 0 and y values in
+    column 1 (any other columns are carried along).  A 2-d array with
+    only one column is treated as y values plotted against their
+    index; in that case the index is added as a new first column so
+    that the selected points keep their original x positions.
+    'method' is one of the keys of 'methods' ('minmax' or 'lttb').
+
+    """
+
+    try:
+        f = methods[method]
+    except KeyError:
+        raise ValueError('unknown decimation method %r' % (method,))
+
+    if len(data) <= n:
+        return data
+    if data.shape[1] == 1:
+        index = numpy.arange(len(data)).astype(data.dtype)
+        data = numpy.concatenate((index[:,numpy.newaxis], data), 1)
+    return f(data, n)
+
+
+def _reduce_mean(blocks, dtype):
+    mean = numpy.add.reduce(blocks, 0, numpy.float64) / len(blocks)
+    if dtype.kind in 'iub':
+        mean = numpy.floor(mean + 0.5)
+    return mean.astype(dtype)
+
+
+def _reduce_max(blocks, dtype):
+    return numpy.maximum.reduce(blocks, 0)
+
+
+def _reduce_min(blocks, dtype):
+    return numpy.minimum.reduce(blocks, 0)
+
+
+reduce_methods = {
+    'mean' : _reduce_mean,
+    'max' : _reduce_max,
+    'min' : _reduce_min,
+    }
+
+
+def block_reduce(data, method='mean'):
+    """Combine the cells of 'data' in 2x2 blocks.
+
+    The first two indices of 'data' select the cell; any further
+    indices (e.g., the colour channel of an RGB image) are carried
+    along.  Each block is replaced by the mean, maximum, or minimum
+    of its cells, according to 'method' (one of the keys of
+    'reduce_methods').  The result has the type of 'data' (means of
+    integer data are rounded).  If a dimension is odd, its last cell
+    forms a block by itself.
+
+    """
+
+    try:
+        f = reduce_methods[method]
+    except KeyError:
+        raise ValueError('unknown reduction method %r' % (method,))
+
+    data = numpy.asarray(data)
+    (n0, n1) = data.shape[:2]
+    if n0 % 2:
+        # Repeat the last row so that it is a block by itself:
+        data = numpy.concatenate((data, data[-1:]), 0)
+    if n1 % 2:
+        data = numpy.concatenate((data, data[:,-1:]), 1)
+    blocks = [data[0::2,0::2], data[1::2,0::2], data[0::2,1::2], data[1::2,1::2]]
+    return f(blocks, data.dtype)
+
+
+class Pyramid:
+    """A cache of successively reduced copies of a 2-d array.
+
+    Level 0 is the array itself; level 'k' has been reduced by a
+    factor of '2**k' in each of its first two dimensions (see
+    'block_reduce()').  Levels are computed the first time they are
+    needed, each from the one before, and then kept, so moving
+    between resolutions (e.g., zooming in and out of a plot) costs
+    nothing after the first time.  The whole pyramid takes at most a
+    third more memory than level 0.
+
+    """
+
+    def __init__(self, data, method='mean'):
+        if method not in reduce_methods:
+            raise ValueError('unknown reduction method %r' % (method,))
+        self.levels = [data]
+        self.method = method
+
+    def level(self, k):
+        """Return the array for level 'k'."""
+
+        while len(self.levels) <= k:
+            self.levels.append(block_reduce(self.levels[-1], self.method))
+        return self.levels[k]
+
+
+def _minmax_level(ymin, ymax, out, branching):
+    """Fill 'out' with the min and max of each 'branching' values.
+
+    'ymin' and 'ymax' are the minima and maxima of the previous level
+    (both are the data themselves for the first level); 'out' is an
+    array of shape (buckets, 2).  The work is done a chunk of buckets
+    at a time so that memory-mapped data are read sequentially and
+    no full-size temporaries are needed.  NaN values are ignored
+    ('fmin'/'fmax'), unless a whole bucket is NaN.
+
+    """
+
+    n = len(ymin)
+    full = n // branching
+    chunk = max(1048576 // branching, 1)
+    for start in range(0, full, chunk):
+        stop = min(start + chunk, full)
+        shape = (stop - start, branching)
+        lo = numpy.reshape(ymin[start * branching:stop * branching], shape)
+        hi = numpy.reshape(ymax[start * branching:stop * branching], shape)
+        out[start:stop,0] = numpy.fmin.reduce(lo, 1)
+        out[start:stop,1] = numpy.fmax.reduce(hi, 1)
+    if full < len(out):
+        # The last bucket is incomplete:
+        out[full,0] = numpy.fmin.reduce(ymin[full * branching:])
+        out[full,1] = numpy.fmax.reduce(ymax[full * branching:])
+
+
+class MinMaxPyramid:
+    """An index of the minima and maxima of a long series.
+
+    Level 'k' (for 'k >= 1') holds the minimum and maximum of each
+    bucket of 'branching**k' consecutive points, in an array of shape
+    (buckets, 2).  The levels are built once, when the pyramid is
+    created; together they take about 2/(branching - 1) times the
+    memory of the y values.  'select()' then returns the points to
+    plot for any range of x at any resolution, reading only about as
+    many values as it returns, however long the series is.
+
+    If 'filename' is given, the levels are stored in the files
+    '<filename>.<k>.npy' and accessed via memory maps; if those files
+    already exist (and have the right shapes) they are reused instead
+    of being built again, so an index of a huge series only has to be
+    built once.
+
+    Members:
+
+        'x', 'y' -- the data (x is None if the y values are plotted
+            against their index).  The x values must be sorted.
+
+        'branching' -- the number of buckets of one level that make
+            up a bucket of the next.
+
+        'levels' -- the list of levels; 'levels[0]' is None.
+
+    """
+
+    def __init__(self, x, y, branching=4, filename=None):
+        if x is not None and len(x) != len(y):
+            raise ValueError('x and y must have the same length')
+        if branching < 2:
+            raise ValueError('branching must be at least 2')
+        self.x = x
+        self.y = y
+        self.branching = branching
+        self.levels = [None]
+
+        dtype = y.dtype.newbyteorder('=')
+        (ymin, ymax) = (y, y)
+        n = len(y)
+        k = 1
+        while n > branching:
+            n = -(-n // branching)
+            (out, ready) = self._open_level(filename, k, (n, 2), dtype)
+            if not ready:
+                _minmax_level(ymin, ymax, out, branching)
+                if filename is not None:
+                    out.flush()
+            self.levels.append(out)
+            (ymin, ymax) = (out[:,0], out[:,1])
+            k = k + 1
+
+    def _open_level(self, filename, k, shape, dtype):
+        """Return '(array, ready)' for level 'k'.
+
+        If 'filename' is None, the array is a new, empty one.
+        Otherwise it is a memory map of the level's file: if the file
+        already holds an array of the right shape and type, it is
+        used as is and 'ready' is true; otherwise a new file is
+        created, to be filled in.
+
+        """
+
+        if filename is None:
+            return (numpy.zeros(shape, dtype), 0)
+        from numpy.lib import format
+        path = '%s.%d.npy' % (filename, k)
+        try:
+            out = numpy.load(path, mmap_mode='r')
+        except IOError:
+            pass
+        else:
+            if out.shape == shape and out.dtype == dtype:
+                return (out, 1)
+        return (format.open_memmap(path, mode='w+', dtype=dtype, shape=shape), 0)
+
+    def select(self, xmin=None, xmax=None, width=None):
+        """Return the points needed to plot 'xmin <= x <= xmax'.
+
+        The result is a 2-d array of (x, y) points ('xmin' and 'xmax'
+        may be given in either order).  If there are no more than
+        '2*width' points in the range (or 'width' is None, or the
+        series is too short to have levels), they are returned
+        unchanged (plus one on either side, so that lines run to the
+        edge of the plot).  Otherwise the coarsest level with at least
+        'width' buckets in the range is used, and two points are
+        returned for each bucket, at the x of its first point: its
+        minimum and its maximum.
+
+        """
+
+        if xmin is not None and xmax is not None and xmin > xmax:
+            # A reversed axis:
+            (xmin, xmax) = (xmax, xmin)
+        n = len(self.y)
+        if n == 0:
+            return numpy.zeros((0, 2), numpy.float64)
+        (start, stop) = (0, n)
+        if self.x is None:
+            # (Keep at least one point even if the range is empty.)
+            if xmin is not None:
+                start = min(max(int(numpy.floor(xmin)), 0), n - 1)
+            if xmax is not None:
+                stop = max(min(int(numpy.ceil(xmax)) + 1, n), start + 1)
+        else:
+            if xmin is not None:
+                start = max(numpy.searchsorted(self.x, xmin, 'left') - 1, 0)
+            if xmax is not None:
+                stop = min(numpy.searchsorted(self.x, xmax, 'right') + 1, n)
+
+        if width is None or stop - start <= 2 * width \
+           or len(self.levels) < 2:
+            # (The series might be too short to have any levels.)
+            points = numpy.zeros((stop - start, 2), numpy.float64)
+            if self.x is None:
+                points[:,0] = numpy.arange(start, stop)
+            else:
+                points[:,0] = self.x[start:stop]
+            points[:,1] = self.y[start:stop]
+            return points
+
+        k = 1
+        while k + 1 < len(self.levels) \
+              and (stop - start) // self.branching ** (k + 1) >= width:
+            k = k + 1
+        size = self.branching ** k
+        (first, last) = (start // size, -(-stop // size))
+        buckets = self.levels[k][first:last]
+        points = numpy.zeros((2 * len(buckets), 2), numpy.float64)
+        if self.x is None:
+            x = numpy.arange(first, last) * size
+        else:
+            x = self.x[first * size:last * size:size]
+        points[0::2,0] = x
+        points[1::2,0] = x
+        points[0::2,1] = buckets[:,0]
+        points[1::2,1] = buckets[:,1]
+        return points
@@ -42,12 +42,16 @@ class GnuplotOpts:
 
     # As far as I know, gnuplot under windows can use binary data:
     recognizes_binary_splot = 1
+    recognizes_general_binary = 1
 
     # Apparently gnuplot on windows can use inline data, but we use
     # non-inline data (i.e., temporary files) by default for no
     # special reason:
     prefer_inline_data = 1
 
+    # The number of significant digits of text data (see gp_unix.py):
+    text_precision = None
+
     # os.mkfifo is apparently not supported under Windows.
     support_fifo = 0
     prefer_fifo_data = 0
@@ -33,7 +33,9 @@ class GnuplotOpts:
     recognizes_persist = 1
     prefer_persist = 0
     recognizes_binary_splot = 1
+    recognizes_general_binary = 1
     prefer_inline_data = 0
+    text_precision = None
     support_fifo = 0
     prefer_fifo_data = 0
     default_term = 'x11'
@@ -28,10 +28,14 @@ class GnuplotOpts:
 
     # Apparently the Mac can use binary data:
     recognizes_binary_splot = 1
+    recognizes_general_binary = 1
 
     # Apparently the Mac can not use inline data:
     prefer_inline_data = 0
 
+    # The number of significant digits of text data (see gp_unix.py):
+    text_precision = None
+
     # os.mkfifo is not supported on the Mac.
     support_fifo = 0
     prefer_fifo_data = 0
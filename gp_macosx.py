@@ -31,8 +31,12 @@ class GnuplotOpts:
     recognizes_persist = None # test automatically on first use
     prefer_persist = 0
     recognizes_binary_splot = 1
+    recognizes_general_binary = 1
     prefer_inline_data = 0
 
+    # The number of significant digits of text data (see gp_unix.py):
+    text_precision = None
+
     # os.mkfifo should be supported on Mac OS X.  Let me know if I'm
     # wrong.
     support_fifo = 1
@@ -66,15 +66,31 @@ class GnuplotOpts:
     # demo uses binary=0 to maximize portability.)
     recognizes_binary_splot = 1
 
+    # Gnuplot 4.2 and later can also read arbitrary binary data files
+    # (what the gnuplot manual calls `general binary' data), whose
+    # layout is described on the plot command line by keywords such as
+    # `record', `array' and `format'.  This is used by
+    # `Data(..., binary=1)'.  Set the following variable to 0 if your
+    # version of gnuplot is older.
+    recognizes_general_binary = 1
+
     # Data can be passed to gnuplot through a temporary file or as
     # inline data (i.e., the filename is set to '-' and the data is
     # entered into the gnuplot interpreter followed by 'e').  If
     # prefer_inline_data is true, then use the inline method as
     # default whenever it is supported.  This should be fast but will
     # use more memory since currently the inline data is put into a
-    # big string when the PlotItem is created.
+    # big string when the PlotItem is first plotted.
     prefer_inline_data = 0
 
+    # Data sent to gnuplot as text are formatted with '%s', which
+    # writes 12 significant digits of each float.  That is more than
+    # any plot can show, so if you often send large datasets as text
+    # (e.g., inline data over a slow pipe) you can set the following
+    # variable to a smaller number of significant digits (such as 6).
+    # It can also be set for each PlotItem with `precision=<int>'.
+    text_precision = None
+
     # Does Python implement the threading module and os.mkfifo on this
     # operating system?  If so, the _FIFOFileItem class will be
     # defined in PlotItem.py.
@@ -110,8 +126,17 @@ class GnuplotOpts:
 
 # ############ End of configuration options ############################
 
+import sys, time
 from os import popen
 
+try:
+    import subprocess, threading
+except ImportError:
+    # Python before 2.4; fall back to os.popen():
+    subprocess = None
+
+import Errors
+
 
 def test_persist():
     """Determine whether gnuplot recognizes the option '-persist'.
@@ -135,20 +160,77 @@ def test_persist():
     return GnuplotOpts.recognizes_persist
 
 
+if subprocess is not None:
+    class OutputProcessor(threading.Thread):
+        """In a separate thread, copy the lines read from a pipe to a file.
+
+        Gnuplot's output pipes are drained by these threads, so that
+        gnuplot never blocks because a pipe is full.  A line that is
+        one of the markers registered by 'expect()' is not copied but
+        sets the corresponding event instead (see
+        'GnuplotProcess.sync()').
+
+        """
+
+        def __init__(self, name, input, output):
+            self.input = input
+            self.output = output
+            self.markers = {}
+            self.closed = 0
+
+            threading.Thread.__init__(self, name=name)
+            self.setDaemon(1)
+
+        def expect(self, marker):
+            """Return an event that is set when 'marker' is read."""
+
+            event = threading.Event()
+            self.markers[marker] = event
+            if self.closed:
+                event.set()
+            return event
+
+        def run(self):
+            for line in iter(self.input.readline, ''):
+                event = self.markers.pop(line.strip(), None)
+                if event is not None:
+                    event.set()
+                else:
+                    self.output.write(line)
+                    self.output.flush()
+            self.input.close()
+            # Nothing more will arrive; wake up anybody waiting:
+            self.closed = 1
+            for event in self.markers.values():
+                event.set()
+
+
 class GnuplotProcess:
     """Unsophisticated interface to a running gnuplot program.
 
     This represents a running gnuplot program and the means to
     communicate with it at a primitive level (i.e., pass it commands
     or data).  When the object is destroyed, the gnuplot program exits
-    (unless the 'persist' option was set).  The communication is
-    one-way; gnuplot's text output just goes to stdout with no attempt
-    to check it for error messages.
+    (unless the 'persist' option was set).
+
+    If the 'subprocess' module is available, gnuplot is started with
+    pipes for its standard input, output and error.  Its output and
+    error messages are read by background threads ('OutputProcessor')
+    and copied to sys.stdout and sys.stderr, so that a verbose gnuplot
+    cannot stall by filling a pipe.  Otherwise gnuplot is started with
+    'os.popen()', and its output goes straight to the standard output
+    of the python process.  Either way there is no attempt to check
+    the output for error messages.
 
     Members:
 
         'gnuplot' -- the pipe to the gnuplot command.
 
+        'process' -- the 'subprocess.Popen' object of the gnuplot
+            process, or None if 'os.popen()' is used.
+
+        'pid' -- the process id of gnuplot, or None if it is unknown.
+
     Methods:
 
         '__init__' -- start up the program.
@@ -160,10 +242,15 @@ class GnuplotProcess:
 
         'flush' -- cause pending output to be written immediately.
 
+        'sync' -- wait until gnuplot has executed the commands sent.
+
         'close' -- close the connection to gnuplot.
 
     """
 
+    # Used to generate unique sync markers:
+    _sync_count = 0
+
     def __init__(self, persist=None):
         """Start a gnuplot process.
 
@@ -182,14 +269,38 @@ class GnuplotProcess:
 
         if persist is None:
             persist = GnuplotOpts.prefer_persist
+        command = GnuplotOpts.gnuplot_command
         if persist:
             if not test_persist():
                 raise ('-persist does not seem to be supported '
                        'by your version of gnuplot!')
-            self.gnuplot = popen('%s -persist' % GnuplotOpts.gnuplot_command,
-                                 'w')
+            command = '%s -persist' % (command,)
+
+        if subprocess is None:
+            self.process = None
+            self.pid = None
+            self.gnuplot = popen(command, 'w')
         else:
-            self.gnuplot = popen(GnuplotOpts.gnuplot_command, 'w')
+            # 'exec' makes gnuplot replace the shell, so that 'pid' is
+            # gnuplot's own.  The command may contain options, so it
+            # is still run by the shell:
+            self.process = subprocess.Popen(
+                'exec %s' % (command,), shell=True, bufsize=-1,
+                stdin=subprocess.PIPE, stdout=subprocess.PIPE,
+                stderr=subprocess.PIPE, close_fds=True,
+                )
+            self.pid = self.process.pid
+            self.outprocessor = OutputProcessor(
+                'gnuplot standard output processor',
+                self.process.stdout, sys.stdout
+                )
+            self.outprocessor.start()
+            self.errprocessor = OutputProcessor(
+                'gnuplot standard error processor',
+                self.process.stderr, sys.stderr
+                )
+            self.errprocessor.start()
+            self.gnuplot = self.process.stdin
 
         # forward write and flush methods:
         self.write = self.gnuplot.write
@@ -199,6 +310,9 @@ class GnuplotProcess:
         if self.gnuplot is not None:
             self.gnuplot.close()
             self.gnuplot = None
+            if self.process is not None:
+                # Wait for gnuplot to finish, as os.popen's close() does:
+                self.process.wait()
 
     def __del__(self):
         self.close()
@@ -209,4 +323,36 @@ class GnuplotProcess:
         self.write(s + '\n')
         self.flush()
 
+    def sync(self, timeout=None):
+        """Wait until gnuplot has executed all of the commands sent.
+
+        A unique marker is sent to gnuplot in a 'print' command, and
+        this method waits until gnuplot writes the marker back on its
+        standard error (which is where 'print' writes unless gnuplot
+        was told otherwise with 'set print').  Return the time waited,
+        in seconds.  Raise 'Errors.TimeoutError' if the marker has not
+        come back after 'timeout' seconds (by default, wait as long as
+        necessary), or 'Errors.Error' if gnuplot has exited.  This
+        needs the 'subprocess' module.
+
+        """
+
+        if self.process is None:
+            raise Errors.Error('sync() needs the subprocess module')
+        GnuplotProcess._sync_count += 1
+        marker = 'Gnuplot.py sync %d' % (GnuplotProcess._sync_count,)
+        event = self.errprocessor.expect(marker)
+        start = time.time()
+        self('print "%s"' % (marker,))
+        event.wait(timeout)
+        elapsed = time.time() - start
+        if not event.isSet():
+            # (The marker stays registered, so that it is swallowed
+            # if it turns up later.)
+            raise Errors.TimeoutError(
+                'gnuplot did not respond within %s seconds' % (timeout,))
+        if self.errprocessor.closed:
+            raise Errors.Error('gnuplot has exited')
+        return elapsed
+
 
@@ -27,7 +27,7 @@ keyword arguments and build the 'set terminal' command.
 """
 
 
-import types
+import string, types
 
 import gp, Errors
 
@@ -407,6 +407,7 @@ terminal_opts['png'] = [
         argname='fontsize',
         ),
     KeywordOrBooleanArg(options=['monochrome', 'gray', 'color']),
+    BareStringArg(argname='size', fixedword='size'), # e.g., '800,600'
     ]
 
 terminal_opts['fig'] = [
@@ -477,3 +478,54 @@ terminal_opts['svg'] = [
     KeywordOrBooleanArg(options=['enhanced', 'noenhanced']),
     StringArg(argname='fontfile', fixedword='fontfile'),
     ]
+
+
+# The width in pixels of the plots produced by each terminal, if it
+# uses its default size.  This is used to choose how many points of a
+# 'Data(..., decimate="auto")' item are worth sending to gnuplot.
+# Vector terminals, and terminals that are not listed, are assumed to
+# need every point.
+
+default_resolution = {
+    'x11' : 640,
+    'wxt' : 640,
+    'qt' : 640,
+    'aqua' : 846,
+    'windows' : 640,
+    'png' : 640,
+    }
+
+# The keyword argument that sets the width of the plot (in pixels) for
+# terminals that have one:
+
+resolution_arg = {
+    'png' : 'size',
+    'pict' : 'width',
+    }
+
+
+def get_resolution(terminal, keyw={}):
+    """Return the width in pixels of a plot made with 'terminal'.
+
+    'keyw' are the keyword arguments that will be used to set up the
+    terminal (as passed to 'Gnuplot.hardcopy()'); they are not
+    modified.  A size may be given as a number, as a tuple, or as a
+    string like '800,600'; only the width is used.  Return None if
+    the resolution is unknown or if the terminal produces vector
+    output, which means that all data points should be kept.
+
+    """
+
+    try:
+        size = keyw[resolution_arg[terminal]]
+    except KeyError:
+        return default_resolution.get(terminal)
+
+    if type(size) in (types.TupleType, types.ListType):
+        size = size[0]
+    elif type(size) is types.StringType:
+        size = string.split(string.replace(size, ',', ' '))[0]
+    try:
+        return int(float(size))
+    except ValueError:
+        raise Errors.OptionError('%s=%s' % (resolution_arg[terminal], size,))
@@ -47,6 +47,7 @@ def main():
     wait('Popping up a blank gnuplot window on your screen.')
     g = Gnuplot.Gnuplot(debug=1)
     g.clear()
+    print 'gnuplot process id:', getattr(g.gnuplot, 'pid', None)
 
     # Make two temporary files:
     if hasattr(tempfile, 'mkstemp'):
@@ -81,6 +82,20 @@ def main():
         wait('axes=x2y2')
         g.plot(Gnuplot.Func('sin(x)', axes='x2y2', title='Sine of x'))
 
+        wait('Set the same title and labels again (nothing is sent)')
+        g.title('Title')
+        g.xlabel('x')
+        g.ylabel('y')
+        g.replot()
+
+        wait('Buffered mode: 40 labels and a plot, flushed once')
+        g.buffered = 1
+        for i in range(40):
+            g('set label %d "%d" at %d,0' % (i + 1, i, i - 20))
+        g.plot(Gnuplot.Func('sin(x)'))
+        g.buffered = 0
+        g('unset label')
+
         print 'Change Func attributes after construction:'
         f = Gnuplot.Func('sin(x)')
         wait('Original')
@@ -163,6 +178,27 @@ def main():
         g.plot(Gnuplot.File(filename1))
         wait('Same thing, inline data')
         g.plot(Gnuplot.Data(d, inline=1))
+        wait('Same thing, binary data')
+        g.plot(Gnuplot.Data(d, binary=1))
+        wait('Same thing, binary data saved to a file')
+        Gnuplot.Data(d, binary=1, filename=filename1)
+        g.plot(Gnuplot.File(
+            filename1, binary='record=100 format="%float64%float64%float64"'))
+        wait('Same thing, saved with numpy.save() and read by gnuplot')
+        numpy.save(filename1 + '.npy', numpy.ascontiguousarray(d))
+        g.plot(Gnuplot.NpyFile(filename1 + '.npy'))
+        wait('Same thing, from a memory-mapped array')
+        g.plot(Gnuplot.Data(
+            numpy.load(filename1 + '.npy', mmap_mode='r'), binary=1))
+        wait('Same thing, rounded to int16 and sent as int16 binary data')
+        g.plot(Gnuplot.Data((100 * d).astype(numpy.int16), binary=1))
+        wait('Same thing, from a structured array (text data)')
+        rec = numpy.zeros(len(d), dtype=[('x', 'f8'), ('n', 'i2'),
+                                         ('y', 'f4'), ('dy', 'f4')])
+        (rec['x'], rec['y'], rec['dy']) = (d[:,0], d[:,1], d[:,2])
+        g.plot(Gnuplot.Data(rec, cols=('x', 'y')))
+        wait('Same thing, sent in binary straight from its buffer')
+        g.plot(Gnuplot.Data(rec, cols=('x', 'y'), binary=1))
         wait('with_="lp 4 4"')
         g.plot(Gnuplot.Data(d, with_='lp 4 4'))
         wait('cols=0')
@@ -185,6 +221,103 @@ def main():
         wait('title="Cosine of x"')
         g.plot(Gnuplot.Data(d, title='Cosine of x'))
 
+        wait('Missing values: the masked points are left undefined (NaN)')
+        ym = numpy.ma.masked_where(abs(x) < 2, y2)
+        g.plot(Gnuplot.Data(x, ym, with_='lp'))
+        wait('Same thing, marked with "?" via set datafile missing')
+        g.plot(Gnuplot.Data(x, ym, missing='?', with_='lp'))
+        wait('Same thing, with the line broken at the gap (missing="split")')
+        g.plot(Gnuplot.Data(x, ym, missing='split', with_='lp'))
+        wait('Data written with 3 significant digits (precision=3)')
+        g.plot(Gnuplot.Data(d, precision=3, inline=1))
+
+        print '############### test StreamData #############################'
+        def chunks():
+            for i in range(0, 100, 25):
+                yield d[i:i + 25]
+
+        wait('Plot Data produced by a generator')
+        g.plot(Gnuplot.StreamData(chunks()))
+        wait('Same thing, inline data')
+        g.plot(Gnuplot.StreamData(chunks(), inline=1))
+        wait('Same thing, replotted from a generator function')
+        g.plot(Gnuplot.StreamData(chunks, cols=(0,2)))
+        g.replot()
+
+        print '############### test Datablock #############################'
+        wait('Plot a Datablock (requires gnuplot 5.0)')
+        b = Gnuplot.Datablock(d, cols=(0,1), with_='lines')
+        g.plot(b)
+        wait('Change its style and replot without resending the data')
+        b.set_option(with_='points')
+        g.replot()
+        wait('Two plots of the same Datablock under one name')
+        g.plot(Gnuplot.Datablock(d, name='$test', using=(1,2)),
+               Gnuplot.Datablock(d, name='$test', using=(1,3)))
+
+        print '############### test LiveData ##############################'
+        wait('Plot LiveData, appending 20 points at a time')
+        live = Gnuplot.LiveData(with_='lines')
+        g.plot(live)
+        for i in range(0, 100, 20):
+            g.append(live, d[i:i + 20])
+            time.sleep(0.5)
+        wait('Same thing, binary data')
+        live = Gnuplot.LiveData(d[:20], binary=1, with_='lines')
+        g.plot(live)
+        for i in range(20, 100, 20):
+            g.append(live, d[i:i + 20])
+            time.sleep(0.5)
+
+        print '############### test RollingData and Refresher #############'
+        wait('A rolling window of 50 points, redrawn 10 times a second')
+        window = Gnuplot.RollingData(50, 2, with_='lines')
+        window.push(d[:50,:2])
+        g.plot(window)
+        refresher = Gnuplot.Refresher(g, rate=10)
+        try:
+            for point in d[50:]:
+                window.push(point[:2])
+                time.sleep(0.05)
+        finally:
+            refresher.stop()
+        print '%d frames were drawn' % (refresher.frames,)
+
+        print '############### test decimation #############################'
+        x = numpy.arange(1000000) / 1000.
+        y = numpy.sin(x) + numpy.random.normal(0.0, 0.1, x.shape)
+        wait('A million noisy points, decimated to 1000 (min/max)')
+        g.plot(Gnuplot.Data(x, y, decimate=1000, with_='lines'))
+        wait('Same thing, largest-triangle-three-buckets')
+        g.plot(Gnuplot.Data(x, y, decimate=1000, decimate_method='lttb',
+                            with_='lines'))
+        wait('Same thing, binary data')
+        g.plot(Gnuplot.Data(x, y, decimate=1000, binary=1, with_='lines'))
+        wait('Same thing, decimated to suit the window (decimate="auto")')
+        auto = Gnuplot.Data(x, y, decimate='auto', with_='lines')
+        g.plot(auto)
+        wait('Zoom in to 10 < x < 20 (only the visible points are resent)')
+        g.set_range('xrange', (10, 20))
+        g.refresh()
+        g.set_range('xrange', None)
+
+        print '############### test TimeSeries #############################'
+        wait('Ten million points, indexed; only what is visible is sent')
+        y = numpy.cumsum(numpy.random.normal(0.0, 1.0, 10000000))
+        series = Gnuplot.TimeSeries(y, with_='lines')
+        g.plot(series)
+        for (xmin, xmax) in [(0, 1000000), (500000, 510000), (505000, 505100)]:
+            wait('Zoom in to %d < x < %d' % (xmin, xmax))
+            g.set_range('xrange', (xmin, xmax))
+            g.refresh()
+        wait('The same points on a reversed x axis (xrange [505100:505000])')
+        g.set_range('xrange', (505100, 505000))
+        g.refresh()
+        pyramid = Gnuplot.decimation.MinMaxPyramid(None, y[:100000])
+        assert len(pyramid.select(60000, 50000, 640)) \
+               == len(pyramid.select(50000, 60000, 640)) > 0
+        g.set_range('xrange', None)
+
         print '############### test compute_Data ###########################'
         x = numpy.arange(100)/5. - 10.
 
@@ -243,6 +376,10 @@ def main():
         wait('Testing hardcopy options: fontsize=20')
         g.hardcopy('gp_test.ps', fontsize=20)
 
+        try:
+            print 'Waited for gnuplot to finish: %.3f seconds' % (g.sync(10),)
+        except Gnuplot.Error, e:
+            print 'sync() failed:', e
         print '******** Generating svg file "gp_test.svg" ********'
         wait()
         g.plot(Gnuplot.Func('cos(0.5*x*x)', with_='linespoints 2 2',
@@ -295,6 +432,12 @@ def main():
         wait('Same thing, using binary mode and an intermediate file')
         Gnuplot.GridData(m,x,y, binary=1, filename=filename1)
         g.splot(Gnuplot.File(filename1, binary=1))
+        wait('Same thing, using double-precision binary data')
+        g.splot(Gnuplot.GridData(m,x,y, binary=1, dtype=numpy.float64))
+        wait('Same thing, with a Fortran-ordered array (still no copy)')
+        g.splot(Gnuplot.GridData(numpy.asfortranarray(m),x,y, binary=1))
+        wait('Same thing, on a non-uniform grid (binary matrix format)')
+        g.splot(Gnuplot.GridData(m,x,y**3, binary=1))
 
         wait('The same thing using compute_GridData to tabulate function')
         g.splot(Gnuplot.funcutils.compute_GridData(
@@ -324,9 +467,47 @@ def main():
             g.replot()
             time.sleep(1.0)
 
+        print '############### test Image and RGBImage #####################'
+        g.reset()
+        wait('A function of two variables as an image')
+        g.plot(Gnuplot.Image(numpy.transpose(m), origin=(x[0], y[0]),
+                             dx=x[1] - x[0], dy=y[1] - y[0]))
+        wait('An RGB image (uint8, sent without conversion)')
+        rgb = numpy.zeros((200, 300, 3), numpy.uint8)
+        rgb[:,:,0] = numpy.arange(300) * 255 // 299
+        rgb[:,:,1] = (numpy.arange(200) * 255 // 199)[:,numpy.newaxis]
+        rgb[50:150, 100:200, 2] = 255
+        g.plot(Gnuplot.RGBImage(rgb, flipy=1))
+        wait('A 4000x4000 image, reduced to suit the window (mipmap="max")')
+        big = numpy.random.random((4000, 4000)).astype(numpy.float32)
+        g.plot(Gnuplot.Image(big, mipmap='max'))
+        wait('Zoom in to 1000 < x < 1200 (finer cells, only those visible)')
+        g.set_range('xrange', (1000, 1200))
+        g.refresh()
+        g.set_range('xrange', None)
+
+        print '############### test AsyncGnuplot ###########################'
+        wait('Three more gnuplot windows, drawn by worker threads')
+        gs = [Gnuplot.AsyncGnuplot(), Gnuplot.AsyncGnuplot(),
+              Gnuplot.AsyncGnuplot()]
+        requests = []
+        for i in range(len(gs)):
+            gs[i].plot(Gnuplot.Func('sin(%d*x)' % (i + 1,)))
+            requests.append(gs[i].sync(10))
+        for request in requests:
+            try:
+                print 'Drawn after %.3f seconds' % (request.wait(),)
+            except Gnuplot.Error, e:
+                print 'sync() failed:', e
+        wait('Close them')
+        for a in gs:
+            a.close()
+
         wait(prompt='Press return to end the test.\n')
     finally:
         os.unlink(filename1)
+        if os.path.exists(filename1 + '.npy'):
+            os.unlink(filename1 + '.npy')
         os.unlink(filename2)
 
 
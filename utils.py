@@ -15,6 +15,24 @@ particularly gnuplot-related.
 import string
 import numpy
 
+def fill_masked(m):
+    """Return 'm' with the masked values of a masked array set to NaN.
+
+    If 'm' is a 'numpy.ma' masked array, return an ordinary float
+    array (float64 unless 'm' is float32) in which the masked values
+    are NaN; otherwise return 'm' unchanged.
+
+    """
+
+    if not numpy.ma.isMaskedArray(m):
+        return m
+    if m.dtype == numpy.float32:
+        dtype = numpy.float32
+    else:
+        dtype = numpy.float64
+    return numpy.ma.filled(m.astype(dtype), numpy.nan)
+
+
 def float_array(m):
     """Return the argument as a numpy array of type at least 'Float32'.
 
@@ -22,10 +40,12 @@ def float_array(m):
     'Float32'.  Allow also for the possibility that the argument is a
     python native type that can be converted to a numpy array using
     'numpy.asarray()', but in that case don't worry about
-    downcasting to single-precision float.
+    downcasting to single-precision float.  The masked values of a
+    masked array become NaN (see 'fill_masked()').
 
     """
 
+    m = fill_masked(m)
     try:
         # Try Float32 (this will refuse to downcast)
         return numpy.asarray(m, numpy.float32)
@@ -41,9 +61,49 @@ def float_array(m):
             print "Fatal: array dimensions not equal!"
             return None
 
+# The number of values that write_array() formats with a single '%'
+# operation.  Larger chunks make fewer trips through the interpreter
+# at the cost of more temporary memory.
+chunk_values = 65536
+
+
+def _escape_format(s):
+    """Return s with '%' characters escaped for use in a format string."""
+
+    return string.replace(s, '%', '%%')
+
+
+def value_format(precision=None):
+    """Return the format used by write_array() for a single value.
+
+    If 'precision' is None, values are formatted with '%s', which
+    writes 12 significant digits for floats.  Otherwise they are
+    written with '%.<precision>g', i.e., with at most 'precision'
+    significant digits and without trailing zeros.
+
+    """
+
+    if precision is None:
+        return '%s'
+    else:
+        return '%%.%dg' % (precision,)
+
+
+def write_binary(f, set):
+    """Write the raw bytes of an array to a file.
+
+    The bytes are written in memory order straight from the array's
+    buffer if it is contiguous, so no copy of the data is made.
+
+    """
+
+    f.write(buffer(numpy.ascontiguousarray(set)))
+
+
 def write_array(f, set,
                 item_sep=' ',
-                nest_prefix='', nest_suffix='\n', nest_sep=''):
+                nest_prefix='', nest_suffix='\n', nest_sep='',
+                missing=None, precision=None):
     """Write an array of arbitrary dimension to a file.
 
     A general recursive array writer.  The last four parameters allow
@@ -67,39 +127,110 @@ def write_array(f, set,
         set[1,0,0] set[1,0,1] ...
         set[1,1,0] set[1,1,1] ...
 
+    Rows are not formatted one at a time; see 'write_rows()'.  If
+    'missing' is not None, NaN values are written as the string
+    'missing' (e.g., '?', for use with gnuplot's 'set datafile
+    missing' command).  'precision' limits the number of significant
+    digits written (see 'value_format()'); fewer digits make less text
+    to format and send.
+
     """
 
     if len(set.shape) == 1:
         (columns,) = set.shape
         assert columns > 0
-        fmt = string.join(['%s'] * columns, item_sep)
+        fmt = string.join([value_format(precision)] * columns, item_sep)
         f.write(nest_prefix)
-        f.write(fmt % tuple(set.tolist()))
+        s = fmt % tuple(set.tolist())
+        if missing is not None:
+            s = string.replace(s, 'nan', missing)
+        f.write(s)
         f.write(nest_suffix)
     elif len(set.shape) == 2:
-        # This case could be done with recursion, but `unroll' for
-        # efficiency.
         (points, columns) = set.shape
         assert points > 0 and columns > 0
-        fmt = string.join(['%s'] * columns, item_sep)
-        f.write(nest_prefix + nest_prefix)
-        f.write(fmt % tuple(set[0].tolist()))
-        f.write(nest_suffix)
-        for point in set[1:]:
-            f.write(nest_sep + nest_prefix)
-            f.write(fmt % tuple(point.tolist()))
-            f.write(nest_suffix)
+        f.write(nest_prefix)
+        write_rows(f, set, item_sep, nest_prefix, nest_suffix, nest_sep,
+                   missing, precision)
         f.write(nest_suffix)
     else:
         # Use recursion for three or more dimensions:
         assert set.shape[0] > 0
         f.write(nest_prefix)
         write_array(f, set[0],
-                    item_sep, nest_prefix, nest_suffix, nest_sep)
+                    item_sep, nest_prefix, nest_suffix, nest_sep,
+                    missing, precision)
         for subset in set[1:]:
             f.write(nest_sep)
             write_array(f, subset,
-                        item_sep, nest_prefix, nest_suffix, nest_sep)
+                        item_sep, nest_prefix, nest_suffix, nest_sep,
+                        missing, precision)
         f.write(nest_suffix)
 
 
+def write_rows(f, set,
+               item_sep=' ',
+               nest_prefix='', nest_suffix='\n', nest_sep='',
+               missing=None, precision=None):
+    """Write the rows of a 2-d array to a file, without the enclosing nest.
+
+    This is the inner loop of 'write_array()'.  Each row is written as
+    'nest_prefix', the row's values separated by 'item_sep', then
+    'nest_suffix'; consecutive rows are separated by 'nest_sep'.
+
+    Instead of formatting one row at a time, the array is cut into
+    chunks of about 'chunk_values' values, and each chunk is formatted
+    with a single '%' operation on a format string covering all of its
+    rows.  The output is identical to formatting the rows one by one,
+    but the interpreter is entered once per chunk rather than once per
+    row.  Likewise, if 'missing' is not None, the NaN values in a
+    chunk are replaced by 'missing' with one string operation.  The
+    values are formatted with 'value_format(precision)'.
+
+    """
+
+    (points, columns) = set.shape
+    rowfmt = (
+        _escape_format(nest_prefix)
+        + string.join([value_format(precision)] * columns, item_sep)
+        + _escape_format(nest_suffix)
+        )
+    sep = _escape_format(nest_sep)
+    rows = max(1, chunk_values // columns)
+    fmt = string.join([rowfmt] * rows, sep)
+    for start in range(0, points, rows):
+        chunk = set[start:start + rows]
+        if start:
+            f.write(nest_sep)
+        if len(chunk) != rows:
+            fmt = string.join([rowfmt] * len(chunk), sep)
+        s = fmt % tuple(chunk.ravel().tolist())
+        if missing is not None:
+            s = string.replace(s, 'nan', missing)
+        f.write(s)
+
+
+def write_array_split(f, set, precision=None):
+    """Write a 2-d array, leaving out the rows that contain NaN.
+
+    The rows are written as by 'write_array()', but each run of rows
+    containing NaN values is replaced by a single blank line, which
+    tells gnuplot to break the line at that point.  The runs are found
+    with array operations, so the rows are not checked one at a time.
+    'precision' is as for 'write_array()'.
+
+    """
+
+    if set.dtype.kind in 'fc':
+        good = numpy.logical_not(numpy.isnan(set).any(1))
+    else:
+        good = numpy.ones(len(set), numpy.bool_)
+    edges = numpy.diff(
+        numpy.concatenate(([0], good.astype(numpy.int8), [0])))
+    starts = numpy.flatnonzero(edges == 1)
+    stops = numpy.flatnonzero(edges == -1)
+    if not len(starts):
+        f.write('\n')
+    for (start, stop) in zip(starts.tolist(), stops.tolist()):
+        write_rows(f, set[start:stop], precision=precision)
+        f.write('\n')